@@ -0,0 +1,37 @@
+import time
+
+# Duração de um tick da simulação, em segundos (a velocidade dos NPCs é medida em ticks)
+DURACAO_TICK = 0.25
+
+# Máximo de ticks recuperados de uma vez depois de uma pausa longa (ex.: terminal suspenso)
+MAX_TICKS_ATRASADOS = 4
+
+# Classe que dispara os ticks da simulação em intervalos fixos de tempo real
+class AgendadorTicks:
+    def __init__(self, duracao_tick=DURACAO_TICK, relogio=time.monotonic):
+        self.duracao_tick = duracao_tick
+        self.relogio = relogio
+        self.proximo_tick = relogio() + duracao_tick
+        self.ticks = 0
+
+    # Milissegundos até o próximo tick, usados como timeout da leitura de teclas
+    def espera_ms(self):
+        restante = self.proximo_tick - self.relogio()
+        return max(0, int(restante * 1000) + 1)
+
+    # Quantos ticks venceram desde a última consulta
+    def ticks_vencidos(self):
+        agora = self.relogio()
+        if agora < self.proximo_tick:
+            return 0
+
+        vencidos = int((agora - self.proximo_tick) // self.duracao_tick) + 1
+        if vencidos > MAX_TICKS_ATRASADOS:
+            # Descarta o atraso em vez de simular uma rajada de ticks de uma vez
+            vencidos = MAX_TICKS_ATRASADOS
+            self.proximo_tick = agora + self.duracao_tick
+        else:
+            self.proximo_tick += vencidos * self.duracao_tick
+
+        self.ticks += vencidos
+        return vencidos
@@ -0,0 +1,343 @@
+import argparse
+import curses
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import main
+import salvamento
+from agendador import DURACAO_TICK
+import screen_utils
+from bsp import BSP
+from fov import CampoDeVisao
+from grade import QuadroVisual
+from lote_npcs import LoteNPCs
+from mapa_explorado import MapaExplorado
+from personagens import TIPOS_NPC, Cavaleiro, posicao_inimigo_livre
+from registro_entidades import RegistroEntidades
+from simulacao import (Simulacao, LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, ACAO_NENHUMA,
+                       ACAO_FUGIR)
+
+# Tamanhos de mapa e densidades medidos na geração
+TAMANHOS_MAPA = ((80, 24), (280, 64), (560, 128), (1120, 256))
+DENSIDADES = (0.5, 0.75, 1.0)
+
+# Quantidades de NPCs medidas na atualização por tick
+QUANTIDADES_NPCS = (12, 100, 1000)
+
+# Tolerância padrão (fração) antes de considerar uma medida como regressão
+TOLERANCIA_PADRAO = 0.25
+
+# Tela falsa do curses: guarda o conteúdo em memória e lê as teclas de uma lista
+class TelaFalsa:
+    def __init__(self, altura=40, largura=160, teclas=()):
+        self.altura = altura
+        self.largura = largura
+        self.teclas = list(teclas)
+        self.linhas = [[" "] * largura for _ in range(altura)]
+        self.leituras = []
+
+    def getmaxyx(self):
+        return self.altura, self.largura
+
+    def clear(self):
+        self.linhas = [[" "] * self.largura for _ in range(self.altura)]
+
+    def addstr(self, y, x, texto, atributo=0):
+        self.linhas[y][x:x + len(texto)] = texto[:self.largura - x]
+
+    def addch(self, y, x, caractere, atributo=0):
+        self.linhas[y][x] = caractere if isinstance(caractere, str) else chr(caractere)
+
+    def refresh(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+    def keypad(self, ativo):
+        pass
+
+    def nodelay(self, ativo):
+        pass
+
+    def timeout(self, milissegundos):
+        pass
+
+    def getstr(self, y, x, tamanho):
+        return b"Bench"
+
+    # Cada leitura de tecla marca o fim de um quadro; sem teclas restantes o jogo recebe 'q'
+    def getch(self):
+        self.leituras.append(time.perf_counter())
+        return self.teclas.pop(0) if self.teclas else ord("q")
+
+# Substitui as funções do curses que exigem um terminal de verdade
+@contextmanager
+def curses_sem_terminal():
+    nomes = ("start_color", "init_pair", "color_pair", "doupdate", "curs_set", "echo", "noecho")
+    originais = {nome: getattr(curses, nome) for nome in nomes}
+    curses.start_color = lambda: None
+    curses.init_pair = lambda *argumentos: None
+    curses.color_pair = lambda numero: numero << 8
+    curses.doupdate = lambda: None
+    curses.curs_set = lambda visibilidade: None
+    curses.echo = lambda: None
+    curses.noecho = lambda: None
+    try:
+        yield
+    finally:
+        for nome, funcao in originais.items():
+            setattr(curses, nome, funcao)
+
+# Esquece o estado que desenhar_layout guarda entre chamadas (campo de visão e renderizador)
+def reiniciar_desenho():
+    for atributo in ("campo_visao", "renderizador"):
+        if hasattr(screen_utils.desenhar_layout, atributo):
+            delattr(screen_utils.desenhar_layout, atributo)
+
+# Percentil (0 a 100) de uma lista de medidas
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    posicao = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[posicao]
+
+# Resume uma lista de tempos (em segundos) em milissegundos
+def resumir(tempos, alocado):
+    return {
+        "amostras": len(tempos),
+        "p50_ms": round(percentil(tempos, 50) * 1000, 4),
+        "p99_ms": round(percentil(tempos, 99) * 1000, 4),
+        "media_ms": round(sum(tempos) / len(tempos) * 1000, 4),
+        "pico_alocado_kb": round(alocado / 1024, 1),
+    }
+
+# Mede uma operação: preparar() monta os argumentos fora da medição e operacao(*argumentos) é cronometrada
+# As alocações são medidas numa execução separada com tracemalloc, para não distorcer os tempos
+def medir(operacao, repeticoes, preparar=lambda: ()):
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = preparar()
+        inicio = time.perf_counter()
+        operacao(*argumentos)
+        tempos.append(time.perf_counter() - inicio)
+
+    argumentos = preparar()
+    tracemalloc.start()
+    operacao(*argumentos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resumir(tempos, pico)
+
+# Geração de dungeons para vários tamanhos e densidades
+def medir_geracao(repeticoes):
+    resultados = {}
+    for largura, altura in TAMANHOS_MAPA:
+        for densidade in DENSIDADES:
+            sementes = iter(range(10 ** 6))
+            resultados[f"geracao/{largura}x{altura}/d{densidade}"] = medir(
+                BSP, repeticoes, lambda: (largura, altura, densidade, next(sementes)))
+    return resultados
+
+# Cálculo do campo de visão e desenho completo da interface a partir de posições sorteadas
+def medir_visibilidade(repeticoes):
+    dungeon = BSP(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, 1)
+    rng = random.Random(1)
+    posicoes = [dungeon.indice_piso.aleatoria(rng) for _ in range(repeticoes + 1)]
+    jogador = Cavaleiro("Bench")
+
+    campo = CampoDeVisao()
+    proxima = iter(posicoes)
+    resultados = {"visibilidade/campo_visao": medir(campo.atualizar, repeticoes, lambda: (dungeon, next(proxima)))}
+
+    reiniciar_desenho()
+    tela = TelaFalsa()
+    quadro = QuadroVisual(dungeon)
+    explorado = MapaExplorado(dungeon.largura, dungeon.altura)
+    proxima = iter(posicoes)
+    resultados["visibilidade/desenhar_layout"] = medir(
+        screen_utils.desenhar_layout, repeticoes,
+        lambda: (tela, quadro, next(proxima), "Rodapé", "Painel", jogador, explorado))
+    reiniciar_desenho()
+    return resultados
+
+# Composição e desenho de um quadro da partida (quadro visual, campo de visão, janela e terminal) em mapas
+# de tamanhos diferentes; tempo e alocações devem acompanhar o tamanho da tela, não o do mapa
+def medir_composicao(repeticoes):
+    resultados = {}
+    for largura, altura in (TAMANHOS_MAPA[1], TAMANHOS_MAPA[-1]):
+        simulacao = Simulacao(Cavaleiro("Bench"), largura, altura, semente=6)
+        rng = random.Random(6)
+        acoes = iter([rng.randint(ACAO_NENHUMA, ACAO_FUGIR) for _ in range(repeticoes + 1)])
+        tela = TelaFalsa()
+
+        # O passo da simulação fica na preparação, fora da medição
+        def avancar():
+            simulacao.passo(next(acoes))
+            return ()
+
+        def desenhar_quadro():
+            screen_utils.desenhar_layout(tela, simulacao.quadro_visual(), simulacao.pos_jogador,
+                                         simulacao.texto_rodape(), "Painel", simulacao.jogador, simulacao.explorado)
+
+        reiniciar_desenho()
+        resultados[f"quadro/composicao/{largura}x{altura}"] = medir(desenhar_quadro, repeticoes, avancar)
+    reiniciar_desenho()
+    return resultados
+
+# Um tick de movimento para N NPCs, pelo caminho objeto a objeto e pelo lote em arrays
+def medir_npcs(repeticoes):
+    dungeon = BSP(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, 2)
+    pos_jogador = dungeon.indice_piso.aleatoria(random.Random(2))
+
+    # Cria a mesma população de NPCs (mesma semente) para cada caminho medido
+    def popular(quantidade):
+        random.seed(quantidade)
+        registro = RegistroEntidades()
+        lote = LoteNPCs(dungeon)
+        for _ in range(quantidade):
+            npc = random.choice(TIPOS_NPC)(
+                *posicao_inimigo_livre(dungeon, registro, pos_jogador))
+            registro.adicionar(npc, npc.y, npc.x)
+            lote.adicionar(npc)
+        return registro, lote
+
+    resultados = {}
+    for quantidade in QUANTIDADES_NPCS:
+        registro, lote = popular(quantidade)
+
+        def mover_todos():
+            for npc in lote.npcs:
+                npc.mover(dungeon, pos_jogador, registro)
+
+        resultados[f"npcs/mover/{quantidade}"] = medir(mover_todos, repeticoes)
+
+        registro, lote = popular(quantidade)
+        resultados[f"npcs/lote/{quantidade}"] = medir(lambda: lote.atualizar(pos_jogador, registro), repeticoes)
+    return resultados
+
+# Passos da simulação sem tela (ação do jogador e um tick), o caminho usado por bots e testes em lote
+def medir_simulacao(repeticoes):
+    simulacao = Simulacao(Cavaleiro("Bench"), semente=4)
+    rng = random.Random(4)
+    acoes = iter([rng.randint(ACAO_NENHUMA, ACAO_FUGIR) for _ in range(repeticoes + 1)])
+    return {"simulacao/passo": medir(simulacao.passo, repeticoes, lambda: (next(acoes),))}
+
+# Salvamento completo, delta e carregamento de uma partida no maior tamanho de mapa medido
+def medir_salvamento(repeticoes):
+    largura, altura = TAMANHOS_MAPA[-1]
+    simulacao = Simulacao(Cavaleiro("Bench"), largura, altura, semente=5)
+    simulacao.executar([ACAO_NENHUMA] * 20)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "partida.sav")
+        base = salvamento.salvar(simulacao, caminho)
+        resultados = {
+            "salvamento/completo": medir(salvamento.salvar, repeticoes, lambda: (simulacao, caminho)),
+            "salvamento/delta": medir(lambda: salvamento.para_bytes(simulacao, salvamento.DELTA, base), repeticoes),
+            "salvamento/carregar": medir(salvamento.carregar, repeticoes, lambda: (caminho,)),
+        }
+    return resultados
+
+# Quadros completos do jogo: loop_jogo com teclas sorteadas e um relógio que avança um tick por tecla
+def medir_quadros(repeticoes):
+    rng = random.Random(3)
+    setas = (curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT, ord("f"), -1)
+    teclas = [ord("s"), ord("1")] + [rng.choice(setas) for _ in range(repeticoes)]
+
+    relogio = [0.0]
+    agendador_original = main.AgendadorTicks
+
+    # Cada leitura de tecla avança o relógio do jogo em um tick
+    class TelaComRelogio(TelaFalsa):
+        def getch(self):
+            relogio[0] += DURACAO_TICK
+            return super().getch()
+
+    class AgendadorBenchmark(agendador_original):
+        def __init__(self):
+            super().__init__(DURACAO_TICK, relogio=lambda: relogio[0])
+
+    random.seed(3)
+    reiniciar_desenho()
+    tela = TelaComRelogio(teclas=teclas)
+    main.AgendadorTicks = AgendadorBenchmark
+    try:
+        tracemalloc.start()
+        main.loop_jogo(tela, caminho_salvamento=None)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Roda de novo sem tracemalloc para medir os tempos de quadro
+        random.seed(3)
+        reiniciar_desenho()
+        tela = TelaComRelogio(teclas=teclas)
+        main.loop_jogo(tela, caminho_salvamento=None)
+    finally:
+        main.AgendadorTicks = agendador_original
+        reiniciar_desenho()
+
+    # Ignora as leituras do menu, da escolha de classe e do primeiro quadro (geração do nível)
+    leituras = tela.leituras[3:]
+    tempos = [fim - inicio for inicio, fim in zip(leituras, leituras[1:])]
+    return {"quadro/loop_jogo": resumir(tempos, pico)}
+
+# Executa todas as medições; rapido reduz as repetições para uma checagem rápida
+def executar(rapido=False):
+    repeticoes = 20 if rapido else 200
+    resultados = {}
+    with curses_sem_terminal():
+        resultados.update(medir_geracao(max(3, repeticoes // 20)))
+        resultados.update(medir_visibilidade(repeticoes))
+        resultados.update(medir_composicao(repeticoes))
+        resultados.update(medir_npcs(repeticoes))
+        resultados.update(medir_simulacao(repeticoes))
+        resultados.update(medir_salvamento(max(3, repeticoes // 10)))
+        resultados.update(medir_quadros(repeticoes))
+    return resultados
+
+# Compara resultados com uma linha de base; retorna a lista de medidas que pioraram além da tolerância
+def comparar(resultados, base, tolerancia=TOLERANCIA_PADRAO):
+    regressoes = []
+    for nome, medida in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            continue
+        for campo in ("p50_ms", "p99_ms"):
+            if medida[campo] > anterior[campo] * (1 + tolerancia):
+                regressoes.append(f"{nome} {campo}: {anterior[campo]} -> {medida[campo]}")
+    return regressoes
+
+def principal(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos do jogo (sem terminal)")
+    parser.add_argument("--rapido", action="store_true", help="menos repetições")
+    parser.add_argument("--salvar", metavar="ARQUIVO", help="grava os resultados como linha de base em JSON")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="compara com uma linha de base salva antes")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="piora relativa aceita antes de acusar regressão (padrão: %(default)s)")
+    opcoes = parser.parse_args(argumentos)
+
+    resultados = executar(opcoes.rapido)
+    for nome, medida in resultados.items():
+        print(f"{nome:<36} p50 {medida['p50_ms']:>10.3f} ms  p99 {medida['p99_ms']:>10.3f} ms  "
+              f"pico {medida['pico_alocado_kb']:>9.1f} KiB")
+
+    if opcoes.salvar:
+        with open(opcoes.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, sort_keys=True)
+
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo), opcoes.tolerancia)
+        for regressao in regressoes:
+            print("REGRESSÃO:", regressao)
+        return 1 if regressoes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(principal())
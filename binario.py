@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+from array import array
+
+# Rotinas comuns aos formatos binários do jogo (níveis, índice de piso, salvamentos e cache)
+
+# Converte um array para bytes em little-endian
+def array_para_bytes(valores):
+    if sys.byteorder == "big":
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+# Lê quantidade valores de um array a partir de posicao no buffer; retorna o array e a posição seguinte
+# Um buffer que termina antes dos valores pedidos gera ValueError
+def array_de_buffer(dados, posicao, tipo, quantidade):
+    valores = array(tipo)
+    fim = posicao + quantidade * valores.itemsize
+    if fim > len(dados):
+        raise ValueError("Dados binários truncados")
+    valores.frombytes(dados[posicao:fim])
+    if sys.byteorder == "big":
+        valores.byteswap()
+    return valores, fim
+
+# Grava bytes em um arquivo passando por um temporário no mesmo diretório, para nunca deixar um arquivo
+# pela metade (os.replace troca o arquivo de uma vez)
+def gravar_atomicamente(caminho, dados):
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
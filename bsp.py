@@ -1,165 +1,212 @@
 import random
-
-# Função que gera a dungeon utilizando o algoritmo de divisão binária (BSP - Binary Space Partitioning)
-def BSP(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS):
-    # Classe que representa uma sala retangular
-    class Sala:
-        def __init__(self, x, y, largura, altura):
-            self.x = x
-            self.y = y
-            self.largura = largura
-            self.altura = altura
-
-        # Retorna o centro da sala
-        def centro(self):
-            return (self.x + self.largura // 2, self.y + self.altura // 2)
-
-        # Verifica se esta sala intersecta outra
-        def intersecta(self, outra):
-            return not (
-                self.x + self.largura < outra.x or
-                self.x > outra.x + outra.largura or
-                self.y + self.altura < outra.y or
-                self.y > outra.y + outra.altura
-            )
-
-    # Classe que representa um "nó folha" da divisão BSP
-    class Folha:
-        TAMANHO_MINIMO = 6  # Tamanho mínimo que uma folha pode ter antes de parar de dividir
-
-        def __init__(self, x, y, largura, altura):
-            self.x = x
-            self.y = y
-            self.largura = largura
-            self.altura = altura
-            self.filho_esquerdo = None
-            self.filho_direito = None
-            self.sala = None
-
-        # Divide a folha em duas folhas-filhas
-        def dividir(self):
-            if self.filho_esquerdo or self.filho_direito:
-                return False  # Já foi dividida
-
-            dividir_horizontal = random.choice([True, False])
-
-            # Decide automaticamente a melhor direção de divisão com base no aspecto
-            if self.largura > self.altura and self.largura / self.altura >= 1.25:
-                dividir_horizontal = False
-            elif self.altura > self.largura and self.altura / self.largura >= 1.25:
-                dividir_horizontal = True
-
-            maximo_divisao = (self.altura if dividir_horizontal else self.largura) - Folha.TAMANHO_MINIMO
-            if maximo_divisao <= Folha.TAMANHO_MINIMO:
-                return False  # Muito pequena para dividir
-
-            ponto_divisao = random.randint(Folha.TAMANHO_MINIMO, maximo_divisao)
-
-            if dividir_horizontal:
-                self.filho_esquerdo = Folha(self.x, self.y, self.largura, ponto_divisao)
-                self.filho_direito = Folha(self.x, self.y + ponto_divisao, self.largura, self.altura - ponto_divisao)
-            else:
-                self.filho_esquerdo = Folha(self.x, self.y, ponto_divisao, self.altura)
-                self.filho_direito = Folha(self.x + ponto_divisao, self.y, self.largura - ponto_divisao, self.altura)
-
-            return True
-
-        # Cria salas dentro das folhas (ou conecta salas se for uma folha interna)
-        def criar_salas(self):
-            if self.filho_esquerdo or self.filho_direito:
-                if self.filho_esquerdo:
-                    self.filho_esquerdo.criar_salas()
-                if self.filho_direito:
-                    self.filho_direito.criar_salas()
-
-                sala1 = self.filho_esquerdo.obter_sala_mais_proxima() if self.filho_esquerdo else None
-                sala2 = self.filho_direito.obter_sala_mais_proxima() if self.filho_direito else None
-
-                self.criar_corredor(sala1, sala2)
-            else:
-                if random.random() < DENSIDADE_SALAS:
-                    largura_sala = random.randint(3, self.largura - 2)
-                    altura_sala = random.randint(3, self.altura - 2)
-                    x_sala = random.randint(self.x + 1, self.x + self.largura - largura_sala - 1)
-                    y_sala = random.randint(self.y + 1, self.y + self.altura - altura_sala - 1)
-                    self.sala = Sala(x_sala, y_sala, largura_sala, altura_sala)
-
-        # Cria um corredor entre duas salas
-        def criar_corredor(self, sala1, sala2):
-            if not sala1 or not sala2:
-                return
-
-            x1, y1 = sala1.centro()
-            x2, y2 = sala2.centro()
-
-            # Escolhe aleatoriamente entre corredor em L começando horizontal ou vertical
-            if random.choice([True, False]):
-                self.criar_corredor_horizontal(x1, x2, y1)
-                self.criar_corredor_vertical(y1, y2, x2)
+from grade import GradeDungeon, CHAO
+from indice_piso import IndicePiso
+from nivel import Nivel, Sala
+
+# Direções sorteadas ao dividir uma folha e formatos sorteados para o corredor em L
+ESCOLHAS = (True, False)
+
+# Classe que representa um "nó folha" da divisão BSP
+# sala_mais_proxima é a sala que representa a subárvore na hora de ligá-la à vizinha; é calculada
+# de baixo para cima em criar_salas, em vez de percorrer a subárvore de novo em cada nó
+class Folha:
+    TAMANHO_MINIMO = 6  # Tamanho mínimo que uma folha pode ter antes de parar de dividir
+
+    __slots__ = ("x", "y", "largura", "altura", "filho_esquerdo", "filho_direito", "sala", "sala_mais_proxima")
+
+    def __init__(self, x, y, largura, altura):
+        self.x = x
+        self.y = y
+        self.largura = largura
+        self.altura = altura
+        self.filho_esquerdo = None
+        self.filho_direito = None
+        self.sala = None
+        self.sala_mais_proxima = None
+
+    # Divide a folha em duas folhas-filhas
+    def dividir(self, rng):
+        if self.filho_esquerdo is not None:
+            return False  # Já foi dividida
+
+        # A direção é sorteada mesmo quando o aspecto a decide, para a sequência de sorteios não mudar
+        dividir_horizontal = rng.choice(ESCOLHAS)
+
+        # Decide automaticamente a melhor direção de divisão com base no aspecto
+        largura = self.largura
+        altura = self.altura
+        if largura > altura and largura / altura >= 1.25:
+            dividir_horizontal = False
+        elif altura > largura and altura / largura >= 1.25:
+            dividir_horizontal = True
+
+        maximo_divisao = (altura if dividir_horizontal else largura) - Folha.TAMANHO_MINIMO
+        if maximo_divisao <= Folha.TAMANHO_MINIMO:
+            return False  # Muito pequena para dividir
+
+        ponto_divisao = rng.randint(Folha.TAMANHO_MINIMO, maximo_divisao)
+
+        if dividir_horizontal:
+            self.filho_esquerdo = Folha(self.x, self.y, largura, ponto_divisao)
+            self.filho_direito = Folha(self.x, self.y + ponto_divisao, largura, altura - ponto_divisao)
+        else:
+            self.filho_esquerdo = Folha(self.x, self.y, ponto_divisao, altura)
+            self.filho_direito = Folha(self.x + ponto_divisao, self.y, largura - ponto_divisao, altura)
+
+        return True
+
+    # Cria salas dentro das folhas e conecta as salas dos dois lados de cada folha interna
+    # Percorre a subárvore em pós-ordem com uma pilha: as folhas de um nó são resolvidas antes do corredor dele
+    # Os corredores são escavados na dungeon e anotados em corredores como (x1, y1, x2, y2)
+    def criar_salas(self, rng, densidade_salas, dungeon, corredores):
+        pilha = [(self, False)]
+        while pilha:
+            folha, filhos_prontos = pilha.pop()
+            esquerdo = folha.filho_esquerdo
+            if esquerdo is None:
+                if rng.random() < densidade_salas:
+                    largura_sala = rng.randint(3, folha.largura - 2)
+                    altura_sala = rng.randint(3, folha.altura - 2)
+                    x_sala = rng.randint(folha.x + 1, folha.x + folha.largura - largura_sala - 1)
+                    y_sala = rng.randint(folha.y + 1, folha.y + folha.altura - altura_sala - 1)
+                    folha.sala = Sala(x_sala, y_sala, largura_sala, altura_sala)
+                folha.sala_mais_proxima = folha.sala
+            elif not filhos_prontos:
+                pilha.append((folha, True))
+                pilha.append((folha.filho_direito, False))
+                pilha.append((esquerdo, False))
             else:
-                self.criar_corredor_vertical(y1, y2, x1)
-                self.criar_corredor_horizontal(x1, x2, y2)
-
-        # Função auxiliar para obter a sala mais próxima em uma subárvore
-        def obter_sala_mais_proxima(self):
-            if self.sala:
-                return self.sala
-            salas = []
-            if self.filho_esquerdo:
-                sala_esq = self.filho_esquerdo.obter_sala_mais_proxima()
-                if sala_esq:
-                    salas.append(sala_esq)
-            if self.filho_direito:
-                sala_dir = self.filho_direito.obter_sala_mais_proxima()
-                if sala_dir:
-                    salas.append(sala_dir)
-            return min(salas, key=lambda s: (s.x + s.y)) if salas else None
-
-        # Cria um corredor horizontal
-        def criar_corredor_horizontal(self, x1, x2, y):
-            for x in range(min(x1, x2), max(x1, x2) + 1):
-                dungeon[y][x] = '.'
-
-        # Cria um corredor vertical
-        def criar_corredor_vertical(self, y1, y2, x):
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                dungeon[y][x] = '.'
-
-        # Retorna a sala da folha (ou tenta buscar em filhos)
-        def obter_sala(self):
-            if self.sala:
-                return self.sala
-            elif self.filho_esquerdo:
-                return self.filho_esquerdo.obter_sala()
-            elif self.filho_direito:
-                return self.filho_direito.obter_sala()
-            return None
+                sala1 = esquerdo.sala_mais_proxima
+                sala2 = folha.filho_direito.sala_mais_proxima
+                folha.criar_corredor(sala1, sala2, rng, dungeon, corredores)
+
+                # Representa o nó a sala de menor x + y entre os dois lados (no empate, a da esquerda)
+                if sala1 is None or (sala2 is not None and sala2.x + sala2.y < sala1.x + sala1.y):
+                    folha.sala_mais_proxima = sala2
+                else:
+                    folha.sala_mais_proxima = sala1
+
+    # Cria um corredor entre duas salas
+    def criar_corredor(self, sala1, sala2, rng, dungeon, corredores):
+        if not sala1 or not sala2:
+            return
+
+        x1, y1 = sala1.centro()
+        x2, y2 = sala2.centro()
+
+        # Escolhe aleatoriamente entre corredor em L começando horizontal ou vertical
+        if rng.choice(ESCOLHAS):
+            trechos = ((x1, y1, x2, y1), (x2, y1, x2, y2))
+        else:
+            trechos = ((x1, y1, x1, y2), (x1, y2, x2, y2))
+
+        for trecho in trechos:
+            criar_trecho_corredor(dungeon, *trecho)
+            corredores.append(trecho)
+
+    # Sala que representa a subárvore (disponível depois de criar_salas)
+    def obter_sala_mais_proxima(self):
+        return self.sala_mais_proxima
+
+    # Retorna a sala da folha (ou tenta buscar em filhos)
+    def obter_sala(self):
+        if self.sala:
+            return self.sala
+        elif self.filho_esquerdo:
+            return self.filho_esquerdo.obter_sala()
+        elif self.filho_direito:
+            return self.filho_direito.obter_sala()
+        return None
+
+# Escava um trecho reto de corredor entre (x1, y1) e (x2, y2)
+def criar_trecho_corredor(dungeon, x1, y1, x2, y2):
+    if y1 == y2:
+        dungeon.preencher_horizontal(y1, x1, x2, CHAO)
+    else:
+        dungeon.preencher_vertical(x1, y1, y2, CHAO)
+
+# Converte a árvore BSP em uma lista de nós (em pré-ordem) com índices no lugar de referências
+# Cada nó é (x, y, largura, altura, filho_esquerdo, filho_direito, sala), com -1 quando não existe
+def achatar_arvore(raiz, salas):
+    indice_sala = {id(sala): i for i, sala in enumerate(salas)}
+
+    # Pré-ordem com uma pilha (o filho direito entra primeiro para o esquerdo sair antes)
+    ordem = []
+    pilha = [raiz]
+    while pilha:
+        folha = pilha.pop()
+        ordem.append(folha)
+        if folha.filho_esquerdo is not None:
+            pilha.append(folha.filho_direito)
+            pilha.append(folha.filho_esquerdo)
+
+    indice = {id(folha): i for i, folha in enumerate(ordem)}
+    return [(folha.x, folha.y, folha.largura, folha.altura,
+             indice[id(folha.filho_esquerdo)] if folha.filho_esquerdo is not None else -1,
+             indice[id(folha.filho_direito)] if folha.filho_direito is not None else -1,
+             indice_sala[id(folha.sala)] if folha.sala else -1)
+            for folha in ordem]
+
+# Gera um nível completo (grade, salas, corredores e árvore BSP)
+# semente pode ser um inteiro, uma instância de random.Random ou None (sorteia uma semente nova)
+def gerar_nivel(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, semente=None):
+    if isinstance(semente, random.Random):
+        rng = semente
+        semente = None
+    else:
+        if semente is None:
+            semente = random.getrandbits(32)
+        rng = random.Random(semente)
 
     # Inicializa a dungeon com paredes
-    dungeon = [['#' for _ in range(LARGURA_DUNGEON)] for _ in range(ALTURA_DUNGEON)]
+    dungeon = GradeDungeon(LARGURA_DUNGEON, ALTURA_DUNGEON)
+    corredores = []
 
     raiz = Folha(0, 0, LARGURA_DUNGEON, ALTURA_DUNGEON)
     folhas = [raiz]
 
-    # Realiza divisões sucessivas até não ser mais possível
-    divisao_ativa = True
-    while divisao_ativa:
-        divisao_ativa = False
-        for folha in folhas[:]:
-            if not folha.filho_esquerdo and not folha.filho_direito:
-                if folha.dividir():
-                    folhas.append(folha.filho_esquerdo)
-                    folhas.append(folha.filho_direito)
-                    divisao_ativa = True
+    # Realiza divisões sucessivas, em passadas, até uma passada inteira não dividir nada
+    # Cada passada tenta dividir as folhas pendentes na ordem em que foram criadas: as que não se dividiram
+    # (e que na próxima passada podem sortear outra direção) seguidas das filhas criadas nesta passada
+    # Uma folha com os dois lados até 2 * TAMANHO_MINIMO nunca se divide, mas sorteia a direção a cada
+    # passada; ela fica na lista como None e só faz esse sorteio
+    escolher = rng.choice
+    limite_esteril = 2 * Folha.TAMANHO_MINIMO
+    pendentes = [raiz]
+    while True:
+        novas = []
+        restantes = []
+        for folha in pendentes:
+            if folha is None:
+                escolher(ESCOLHAS)
+                restantes.append(None)
+            elif folha.dividir(rng):
+                novas.append(folha.filho_esquerdo)
+                novas.append(folha.filho_direito)
+            elif folha.largura <= limite_esteril and folha.altura <= limite_esteril:
+                restantes.append(None)
+            else:
+                restantes.append(folha)
+        if not novas:
+            break
+        folhas += novas
+        restantes += novas
+        pendentes = restantes
 
     # Cria salas dentro das folhas e conecta-as
-    raiz.criar_salas()
+    raiz.criar_salas(rng, DENSIDADE_SALAS, dungeon, corredores)
 
     # Marca as salas no mapa (trocando paredes '#' por chão '.')
-    for folha in folhas:
-        if folha.sala:
-            for y in range(folha.sala.y, folha.sala.y + folha.sala.altura):
-                for x in range(folha.sala.x, folha.sala.x + folha.sala.largura):
-                    dungeon[y][x] = '.'
+    salas = [folha.sala for folha in folhas if folha.sala]
+    for sala in salas:
+        dungeon.preencher_retangulo(sala.x, sala.y, sala.largura, sala.altura, CHAO)
 
-    return dungeon
+    # Índice dos tiles de chão usado para posicionar jogador, inimigos e itens
+    dungeon.indice_piso = IndicePiso(dungeon, salas)
+
+    return Nivel(dungeon, salas, corredores, achatar_arvore(raiz, salas), semente, DENSIDADE_SALAS)
+
+# Função que gera a dungeon utilizando o algoritmo de divisão binária (BSP - Binary Space Partitioning)
+# Retorna apenas a grade; use gerar_nivel para obter o nível completo
+def BSP(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, semente=None):
+    return gerar_nivel(LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS, semente).grade
@@ -0,0 +1,117 @@
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from binario import gravar_atomicamente
+from bsp import gerar_nivel
+from indice_piso import IndicePiso
+from nivel import Nivel, VERSAO_FORMATO
+
+# Diretório padrão do cache (pode ser trocado pela variável de ambiente TEMPLO_CACHE_NIVEIS)
+DIRETORIO_PADRAO = os.environ.get(
+    "TEMPLO_CACHE_NIVEIS", os.path.join(os.path.expanduser("~"), ".cache", "into-the-temple", "niveis"))
+
+# Identificação e versão dos arquivos do cache
+MAGICO = b"TPCN"
+VERSAO_CACHE = 1
+
+# Cabeçalho: mágico, versão, tamanho do nível e CRC-32 de tudo o que vem depois; em seguida vêm o nível
+# (Nivel.para_bytes) e o seu índice de piso já pronto (IndicePiso.para_bytes), como no salvamento
+CABECALHO = struct.Struct("<4sHII")
+
+# Conteúdo de um arquivo do cache para o nível dado
+def nivel_para_bytes(nivel):
+    dados_nivel = nivel.para_bytes()
+    corpo = dados_nivel + nivel.grade.indice_piso.para_bytes()
+    return CABECALHO.pack(MAGICO, VERSAO_CACHE, len(dados_nivel), zlib.crc32(corpo)) + corpo
+
+# Reconstrói o nível de um arquivo do cache sem remontar o índice de piso
+# Arquivos de outra versão, truncados ou corrompidos (CRC diferente) geram ValueError
+def nivel_de_buffer(buffer):
+    dados = memoryview(buffer)
+    if len(dados) < CABECALHO.size:
+        raise ValueError("Arquivo do cache truncado")
+    magico, versao, tamanho_nivel, crc = CABECALHO.unpack_from(dados, 0)
+    corpo = dados[CABECALHO.size:]
+    if magico != MAGICO or versao != VERSAO_CACHE:
+        raise ValueError("Formato do cache desconhecido")
+    if tamanho_nivel > len(corpo) or zlib.crc32(corpo) != crc:
+        raise ValueError("Arquivo do cache corrompido")
+
+    nivel = Nivel.de_buffer(corpo[:tamanho_nivel], indexar=False)
+    indice = IndicePiso.de_buffer(corpo[tamanho_nivel:])
+    if (indice.largura, indice.altura) != (nivel.grade.largura, nivel.grade.altura):
+        raise ValueError("Arquivo do cache corrompido")
+    nivel.grade.indice_piso = indice
+    return nivel
+
+# Cache em disco de níveis gerados, endereçado pelo conteúdo dos parâmetros de geração
+class CacheNiveis:
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+
+    # Chave do nível: hash de (semente, largura, altura, densidade) e das versões dos formatos
+    @staticmethod
+    def chave(semente, largura, altura, densidade):
+        texto = f"{VERSAO_CACHE}:{VERSAO_FORMATO}:{semente}:{largura}:{altura}:{float(densidade)!r}"
+        return hashlib.sha256(texto.encode("ascii")).hexdigest()
+
+    # Caminho do arquivo correspondente a uma chave
+    def caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave + ".nivel")
+
+    # Carrega um nível do cache mapeando o arquivo em memória (grade e índice saem direto do mapa, sem ler
+    # o arquivo para um bytes intermediário); retorna None se não estiver em cache ou se o arquivo não servir
+    def carregar(self, semente, largura, altura, densidade):
+        try:
+            with open(self.caminho(self.chave(semente, largura, altura, densidade)), "rb") as arquivo:
+                with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                    # O erro é descartado antes de sair do with: as fatias do mapa presas no traceback
+                    # impediriam o mmap de fechar
+                    try:
+                        return nivel_de_buffer(mapa)
+                    except ValueError:
+                        pass
+        except (FileNotFoundError, ValueError):
+            # ValueError: arquivo vazio, que o mmap não mapeia
+            pass
+        return None
+
+    # Grava um nível no cache; a escrita passa por um arquivo temporário para nunca deixar arquivos pela metade
+    def salvar(self, nivel):
+        if nivel.semente is None:
+            raise ValueError("Só níveis gerados a partir de uma semente inteira podem ir para o cache")
+
+        caminho = self.caminho(self.chave(nivel.semente, nivel.grade.largura, nivel.grade.altura, nivel.densidade))
+        gravar_atomicamente(caminho, nivel_para_bytes(nivel))
+
+    # Como obter, mas devolve o conteúdo do arquivo do cache (ver nivel_para_bytes) em vez do nível
+    # Serve para passar o nível entre processos já com o índice de piso, lido depois com nivel_de_buffer
+    def obter_em_bytes(self, semente, largura, altura, densidade):
+        caminho = self.caminho(self.chave(semente, largura, altura, densidade))
+        try:
+            with open(caminho, "rb") as arquivo:
+                dados = arquivo.read()
+            nivel_de_buffer(dados)
+            return dados
+        except (FileNotFoundError, ValueError):
+            pass
+        dados = nivel_para_bytes(gerar_nivel(largura, altura, densidade, semente))
+        gravar_atomicamente(caminho, dados)
+        return dados
+
+    # Retorna o nível do cache ou, se ainda não existir (ou o arquivo estiver corrompido), gera e guarda
+    def obter(self, semente, largura, altura, densidade):
+        nivel = self.carregar(semente, largura, altura, densidade)
+        if nivel is None:
+            nivel = gerar_nivel(largura, altura, densidade, semente)
+            self.salvar(nivel)
+        return nivel
+
+# Executada num processo trabalhador: o nível da semente vem do cache em diretorio (ou é gerado e guardado
+# nele) e volta no formato do cache, com o índice de piso pronto; com diretorio None, só é gerado
+def obter_nivel_em_bytes(diretorio, semente, largura, altura, densidade):
+    if diretorio is None:
+        return nivel_para_bytes(gerar_nivel(largura, altura, densidade, semente))
+    return CacheNiveis(diretorio).obter_em_bytes(semente, largura, altura, densidade)
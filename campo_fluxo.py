@@ -0,0 +1,72 @@
+from array import array
+from collections import deque
+from lote_npcs import DIRECOES_POR_MASCARA, CIMA, BAIXO, ESQUERDA, DIREITA, mascara_vizinhos
+
+# Distância marcada nos tiles que a busca não alcançou
+INALCANCAVEL = 0xFFFF
+
+# Campo de distâncias até o jogador (busca em largura sobre o chão), compartilhado por todos os NPCs
+# Além da distância, cada tile guarda as direções que levam a um vizinho mais perto do jogador
+class CampoDeFluxo:
+    # mascara permite reaproveitar a máscara de vizinhos já montada para a mesma grade (ex.: a do LoteNPCs)
+    def __init__(self, grade, alcance, mascara=None):
+        self.largura = grade.largura
+        self.alcance = alcance
+        self.mascara = mascara if mascara is not None else mascara_vizinhos(grade)
+        self.distancias = array("H", [INALCANCAVEL]) * len(grade.celulas)
+        self.descida = bytearray(len(grade.celulas))
+        self.alcancados = array("I")
+        self.origem = None
+
+    # Refaz o campo a partir da posição do jogador, apenas se ela mudou
+    # Só os tiles alcançados na busca anterior são limpos, então o custo depende do alcance, não do mapa
+    def atualizar(self, pos_jogador):
+        if pos_jogador == self.origem:
+            return False
+        self.origem = pos_jogador
+
+        largura = self.largura
+        mascara = self.mascara
+        distancias = self.distancias
+        descida = self.descida
+        for indice in self.alcancados:
+            distancias[indice] = INALCANCAVEL
+            descida[indice] = 0
+
+        jogador_y, jogador_x = pos_jogador
+        origem = jogador_y * largura + jogador_x
+        alcancados = array("I", [origem])
+        distancias[origem] = 0
+        fila = deque(alcancados)
+
+        # Para cada vizinho, o deslocamento no bytearray e o bit da direção que volta ao tile atual
+        vizinhos = ((CIMA, -largura, BAIXO), (BAIXO, largura, CIMA), (ESQUERDA, -1, DIREITA), (DIREITA, 1, ESQUERDA))
+        while fila:
+            indice = fila.popleft()
+            proxima = distancias[indice] + 1
+            if proxima > self.alcance:
+                continue
+            for bit, deslocamento, volta in vizinhos:
+                if not mascara[indice] & bit:
+                    continue
+                vizinho = indice + deslocamento
+                distancia = distancias[vizinho]
+                if distancia == INALCANCAVEL:
+                    distancias[vizinho] = proxima
+                    descida[vizinho] = volta
+                    alcancados.append(vizinho)
+                    fila.append(vizinho)
+                elif distancia == proxima:
+                    descida[vizinho] |= volta
+
+        self.alcancados = alcancados
+        return True
+
+    # Distância em passos de (y, x) até o jogador, ou None se estiver fora do alcance
+    def distancia(self, y, x):
+        distancia = self.distancias[y * self.largura + x]
+        return None if distancia == INALCANCAVEL else distancia
+
+    # Tiles vizinhos de (y, x) que ficam um passo mais perto do jogador, na ordem de DIRECOES
+    def passos(self, y, x):
+        return [(y + dy, x + dx) for dy, dx in DIRECOES_POR_MASCARA[self.descida[y * self.largura + x]]]
@@ -0,0 +1,105 @@
+# Campo de visão do jogador calculado por sombreamento recursivo (recursive shadowcasting)
+from grade import PAREDE
+
+# Alcance máximo da visão do jogador, em tiles
+RAIO_VISAO = 12
+
+# Tamanho da janela da dungeon mostrada em volta do jogador (na tela do jogo e nos quadros do servidor)
+LARGURA_VISAO = 70
+ALTURA_VISAO = 16
+
+# Multiplicadores (xx, xy, yx, yy) que levam cada um dos oito octantes para as coordenadas do mapa
+OCTANTES = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+# Janela (topo, esquerda, altura, largura) de um mapa largura_mapa x altura_mapa mostrada com o jogador em
+# pos_jogador: centrada nele, mas sem passar das bordas do mapa (em mapas menores que a janela, o mapa todo)
+def janela_visao(pos_jogador, largura_mapa, altura_mapa, largura=LARGURA_VISAO, altura=ALTURA_VISAO):
+    jogador_y, jogador_x = pos_jogador
+    topo = max(0, min(jogador_y - altura // 2, altura_mapa - altura))
+    esquerda = max(0, min(jogador_x - largura // 2, largura_mapa - largura))
+    return topo, esquerda, min(altura, altura_mapa - topo), min(largura, largura_mapa - esquerda)
+
+# Classe que mantém o conjunto de tiles visíveis a partir da posição do jogador
+class CampoDeVisao:
+    def __init__(self, raio=RAIO_VISAO):
+        self.raio = raio
+        self.visiveis = set()
+        self.origem = None
+        self.mapa = None
+        # Quantos octantes e sub-octantes (chamadas de _lancar_luz) o último cálculo percorreu
+        self.raios = 0
+
+    # Recalcula o campo de visão apenas se o jogador se moveu ou o mapa mudou
+    # Retorna True quando o conjunto de tiles visíveis foi recalculado
+    def atualizar(self, mapa, pos_jogador):
+        if pos_jogador == self.origem and mapa is self.mapa:
+            return False
+
+        self.origem = pos_jogador
+        self.mapa = mapa
+        self.visiveis.clear()
+        self.raios = 0
+
+        jogador_y, jogador_x = pos_jogador
+        self.visiveis.add((jogador_y, jogador_x))
+        for xx, xy, yx, yy in OCTANTES:
+            self._lancar_luz(mapa, jogador_y, jogador_x, 1, 1.0, 0.0, xx, xy, yx, yy)
+        return True
+
+    # Verifica se um tile está dentro do campo de visão atual
+    def visivel(self, y, x):
+        return (y, x) in self.visiveis
+
+    # Percorre um octante linha a linha, recursando a cada parede que projeta sombra
+    def _lancar_luz(self, mapa, centro_y, centro_x, linha, inicio, fim, xx, xy, yx, yy):
+        if inicio < fim:
+            return
+        self.raios += 1
+
+        altura = mapa.altura
+        largura = mapa.largura
+        celulas = mapa.celulas
+        raio = self.raio
+        raio_quadrado = raio * raio
+        visiveis = self.visiveis
+        novo_inicio = 0.0
+
+        for distancia in range(linha, raio + 1):
+            dx = -distancia - 1
+            dy = -distancia
+            bloqueado = False
+
+            while dx <= 0:
+                dx += 1
+                x = centro_x + dx * xx + dy * xy
+                y = centro_y + dx * yx + dy * yy
+                inclinacao_esquerda = (dx - 0.5) / (dy + 0.5)
+                inclinacao_direita = (dx + 0.5) / (dy - 0.5)
+
+                if inicio < inclinacao_direita:
+                    continue
+                if fim > inclinacao_esquerda:
+                    break
+
+                dentro = 0 <= y < altura and 0 <= x < largura
+                if dentro and dx * dx + dy * dy <= raio_quadrado:
+                    visiveis.add((y, x))
+
+                # Fora do mapa conta como parede
+                opaco = not dentro or celulas[y * largura + x] == PAREDE
+                if bloqueado:
+                    if opaco:
+                        novo_inicio = inclinacao_direita
+                        continue
+                    bloqueado = False
+                    inicio = novo_inicio
+                elif opaco and distancia < raio:
+                    bloqueado = True
+                    self._lancar_luz(mapa, centro_y, centro_x, distancia + 1, inicio, inclinacao_esquerda, xx, xy, yx, yy)
+                    novo_inicio = inclinacao_direita
+
+            if bloqueado:
+                break
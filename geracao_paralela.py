@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from bsp import gerar_nivel
+from nivel import Nivel
+
+# Tarefas pendentes por processo trabalhador; limita a memória ao consumir listas enormes de sementes
+TAREFAS_POR_TRABALHADOR = 4
+# Marca o fim das sementes; None não serve, pois é uma semente válida (sorteada no processo trabalhador)
+_FIM = object()
+
+# Executada em cada processo: gera o nível e devolve só o formato binário compacto
+def gerar_nivel_em_bytes(semente, largura, altura, densidade):
+    return semente, gerar_nivel(largura, altura, densidade, semente).para_bytes()
+
+# Gera vários níveis em paralelo num pool de processos, devolvendo (semente, nível) conforme cada um termina
+# Com como_bytes=True os níveis chegam no formato binário (para gravar em disco ou memória compartilhada)
+def gerar_varios(sementes, largura, altura, densidade, trabalhadores=None, como_bytes=False):
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+    sementes = iter(sementes)
+    limite = trabalhadores * TAREFAS_POR_TRABALHADOR
+
+    with ProcessPoolExecutor(max_workers=trabalhadores) as pool:
+        pendentes = set()
+        esgotadas = False
+        while True:
+            # Mantém a fila do pool cheia sem enviar todas as sementes de uma vez
+            while not esgotadas and len(pendentes) < limite:
+                semente = next(sementes, _FIM)
+                if semente is _FIM:
+                    esgotadas = True
+                else:
+                    pendentes.add(pool.submit(gerar_nivel_em_bytes, semente, largura, altura, densidade))
+            if not pendentes:
+                break
+
+            concluidas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for tarefa in concluidas:
+                semente, dados = tarefa.result()
+                yield semente, dados if como_bytes else Nivel.de_buffer(dados)
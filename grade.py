@@ -0,0 +1,138 @@
+# Grade compacta da dungeon: um único bytearray com um código por tile, linha a linha
+
+# Códigos dos tiles (o próprio valor ASCII do caractere exibido)
+PAREDE = ord('#')
+CHAO = ord('.')
+VAZIO = ord(' ')
+
+# Tiles de chão (com ou sem personagem em cima) e símbolos dos NPCs, como aparecem na grade desenhada
+TILES_CAMINHAVEIS = b".@NFS"
+SIMBOLOS_NPC = b"NFS"
+
+# Classe de cada código de tile em bits, consultada por índice em vez de testes de pertinência
+TILE_CAMINHAVEL = 1
+TILE_NPC = 2
+
+CLASSE_TILE = bytearray(256)
+for codigo in TILES_CAMINHAVEIS:
+    CLASSE_TILE[codigo] |= TILE_CAMINHAVEL
+for codigo in SIMBOLOS_NPC:
+    CLASSE_TILE[codigo] |= TILE_NPC
+
+# Classe que representa o mapa da dungeon como uma grade plana de bytes
+class GradeDungeon:
+    __slots__ = ("largura", "altura", "celulas", "indice_piso")
+
+    def __init__(self, largura, altura, preenchimento=PAREDE, celulas=None):
+        self.largura = largura
+        self.altura = altura
+        if celulas is None:
+            celulas = bytearray([preenchimento]) * (largura * altura)
+        self.celulas = celulas
+        # Índice dos tiles de chão (IndicePiso), preenchido pelo gerador do mapa
+        self.indice_piso = None
+
+    def __len__(self):
+        return self.altura
+
+    # Converte uma coordenada (y, x) em índice dentro do bytearray
+    def indice(self, y, x):
+        return y * self.largura + x
+
+    # Verifica se a coordenada está dentro dos limites da grade
+    def dentro(self, y, x):
+        return 0 <= y < self.altura and 0 <= x < self.largura
+
+    # Retorna o código do tile em (y, x)
+    def obter(self, y, x):
+        return self.celulas[y * self.largura + x]
+
+    # Altera o código do tile em (y, x)
+    def definir(self, y, x, codigo):
+        self.celulas[y * self.largura + x] = codigo
+
+    # Retorna o tile em (y, x) como caractere
+    def caractere(self, y, x):
+        return chr(self.celulas[y * self.largura + x])
+
+    # Verifica se o tile existe e é chão
+    def caminhavel(self, y, x):
+        return 0 <= y < self.altura and 0 <= x < self.largura and self.celulas[y * self.largura + x] == CHAO
+
+    # Retorna uma linha da grade sem copiá-la (memoryview de códigos)
+    def linha(self, y):
+        inicio = y * self.largura
+        return memoryview(self.celulas)[inicio:inicio + self.largura]
+
+    # Retorna uma cópia de uma coluna da grade
+    def coluna(self, x):
+        return self.celulas[x::self.largura]
+
+    # Retorna uma linha da grade como texto, pronta para ser desenhada
+    def texto_linha(self, y):
+        inicio = y * self.largura
+        return self.celulas[inicio:inicio + self.largura].decode("ascii")
+
+    # Preenche um retângulo inteiro com o mesmo código, uma fatia por linha
+    def preencher_retangulo(self, x, y, largura, altura, codigo):
+        trecho = bytes([codigo]) * largura
+        for linha in range(y, y + altura):
+            inicio = linha * self.largura + x
+            self.celulas[inicio:inicio + largura] = trecho
+
+    # Preenche um segmento horizontal (extremos inclusos)
+    def preencher_horizontal(self, y, x1, x2, codigo):
+        inicio = y * self.largura + min(x1, x2)
+        tamanho = abs(x2 - x1) + 1
+        self.celulas[inicio:inicio + tamanho] = bytes([codigo]) * tamanho
+
+    # Preenche um segmento vertical (extremos inclusos) com uma fatia de passo igual à largura
+    def preencher_vertical(self, x, y1, y2, codigo):
+        inicio = min(y1, y2) * self.largura + x
+        tamanho = abs(y2 - y1) + 1
+        self.celulas[inicio:inicio + tamanho * self.largura:self.largura] = bytes([codigo]) * tamanho
+
+    # Retorna uma cópia independente da grade
+    def copia(self):
+        return GradeDungeon(self.largura, self.altura, celulas=bytearray(self.celulas))
+
+# Quadro mostrado na tela: o mapa base mais uma camada de sobreposição (jogador, NPCs, inimigo do combate),
+# sem copiar o mapa; quem desenha pede só os trechos de linha da janela visível
+# A sobreposição é um dicionário índice da grade (y * largura + x) -> código; com fundo, todo tile fora
+# da sobreposição aparece com esse código em vez do código do mapa (ex.: o combate, sobre um fundo vazio)
+class QuadroVisual:
+    __slots__ = ("base", "sobreposicao", "fundo", "largura", "altura")
+
+    def __init__(self, base, fundo=None):
+        self.base = base
+        self.sobreposicao = {}
+        self.fundo = fundo
+        self.largura = base.largura
+        self.altura = base.altura
+
+    # Coloca um código na sobreposição em (y, x)
+    def definir(self, y, x, codigo):
+        self.sobreposicao[y * self.largura + x] = codigo
+
+    # Código mostrado no tile de índice dado
+    def codigo(self, indice):
+        codigo = self.sobreposicao.get(indice)
+        if codigo is None:
+            codigo = self.base.celulas[indice] if self.fundo is None else self.fundo
+        return codigo
+
+    # Retorna o código mostrado em (y, x)
+    def obter(self, y, x):
+        return self.codigo(y * self.largura + x)
+
+    # Códigos mostrados na linha y das colunas inicio a fim (sem incluir fim), numa cópia só desse trecho
+    def trecho(self, y, inicio, fim):
+        comeco = y * self.largura + inicio
+        if self.fundo is None:
+            codigos = self.base.celulas[comeco:comeco + fim - inicio]
+        else:
+            codigos = bytearray((self.fundo,)) * (fim - inicio)
+        for indice, codigo in self.sobreposicao.items():
+            if comeco <= indice < comeco + fim - inicio:
+                codigos[indice - comeco] = codigo
+        return codigos
@@ -0,0 +1,170 @@
+import random
+import re
+import struct
+from array import array
+from binario import array_para_bytes, array_de_buffer
+from grade import CHAO
+
+# Lado (em tiles) de cada balde do índice espacial
+TAMANHO_BALDE = 16
+
+# Sorteios diretos tentados antes de percorrer os baldes ao procurar um tile longe do jogador
+TENTATIVAS_RAPIDAS = 8
+
+# Trechos contínuos de chão dentro do bytearray da grade
+PADRAO_CHAO = re.compile(re.escape(bytes([CHAO])) + b"+")
+
+# Cabeçalho do índice serializado: largura, altura e quantidades de tiles, baldes e salas
+CABECALHO = struct.Struct("<IIIII")
+
+# Índice dos tiles de chão de uma dungeon, montado uma única vez junto com o mapa
+# Cada tile é guardado pelo seu índice na grade (y * largura + x)
+class IndicePiso:
+    def __init__(self, grade, salas=()):
+        self.largura = grade.largura
+        self.altura = grade.altura
+
+        # Todos os tiles de chão, em ordem crescente
+        self.celulas = array("I")
+        for trecho in PADRAO_CHAO.finditer(grade.celulas):
+            self.celulas.extend(range(trecho.start(), trecho.end()))
+
+        # Tiles de cada sala, na mesma ordem das salas recebidas
+        self.por_sala = []
+        for sala in salas:
+            celulas_sala = array("I")
+            for y in range(sala.y, sala.y + sala.altura):
+                inicio = y * self.largura + sala.x
+                celulas_sala.extend(range(inicio, inicio + sala.largura))
+            self.por_sala.append(celulas_sala)
+
+        # Índice espacial: baldes quadrados de TAMANHO_BALDE tiles, cada um com seus tiles de chão
+        self.baldes = {}
+        for celula in self.celulas:
+            y, x = divmod(celula, self.largura)
+            chave = (y // TAMANHO_BALDE, x // TAMANHO_BALDE)
+            balde = self.baldes.get(chave)
+            if balde is None:
+                balde = self.baldes[chave] = array("I")
+            balde.append(celula)
+
+    def __len__(self):
+        return len(self.celulas)
+
+    # Serializa o índice pronto, para que carregar um nível salvo não precise percorrer a grade de novo
+    def para_bytes(self):
+        chaves = array("i", [valor for chave in self.baldes for valor in chave])
+        tamanhos_baldes = array("I", [len(celulas) for celulas in self.baldes.values()])
+        tamanhos_salas = array("I", [len(celulas) for celulas in self.por_sala])
+        # Tiles de todos os baldes e de todas as salas em sequência, cada grupo num único array
+        celulas_baldes = array("I")
+        for celulas in self.baldes.values():
+            celulas_baldes += celulas
+        celulas_salas = array("I")
+        for celulas in self.por_sala:
+            celulas_salas += celulas
+
+        return b"".join((
+            CABECALHO.pack(self.largura, self.altura, len(self.celulas), len(self.baldes), len(self.por_sala)),
+            array_para_bytes(self.celulas), array_para_bytes(chaves), array_para_bytes(tamanhos_baldes),
+            array_para_bytes(tamanhos_salas), array_para_bytes(celulas_baldes), array_para_bytes(celulas_salas),
+        ))
+
+    # Reconstrói um índice serializado por para_bytes; só copia arrays, sem nenhum laço por tile
+    # Buffers truncados geram ValueError
+    @staticmethod
+    def de_buffer(buffer):
+        dados = memoryview(buffer)
+        if len(dados) < CABECALHO.size:
+            raise ValueError("Índice de piso truncado")
+        largura, altura, total_celulas, total_baldes, total_salas = CABECALHO.unpack_from(dados, 0)
+        posicao = CABECALHO.size
+
+        indice = IndicePiso.__new__(IndicePiso)
+        indice.largura = largura
+        indice.altura = altura
+        indice.celulas, posicao = array_de_buffer(dados, posicao, "I", total_celulas)
+        chaves, posicao = array_de_buffer(dados, posicao, "i", 2 * total_baldes)
+        tamanhos_baldes, posicao = array_de_buffer(dados, posicao, "I", total_baldes)
+        tamanhos_salas, posicao = array_de_buffer(dados, posicao, "I", total_salas)
+        celulas_baldes, posicao = array_de_buffer(dados, posicao, "I", sum(tamanhos_baldes))
+        celulas_salas, posicao = array_de_buffer(dados, posicao, "I", sum(tamanhos_salas))
+
+        # Cada balde e cada sala é uma fatia dos arrays lidos de uma vez
+        indice.baldes = {}
+        inicio = 0
+        for i, tamanho in enumerate(tamanhos_baldes):
+            indice.baldes[(chaves[2 * i], chaves[2 * i + 1])] = celulas_baldes[inicio:inicio + tamanho]
+            inicio += tamanho
+        indice.por_sala = []
+        inicio = 0
+        for tamanho in tamanhos_salas:
+            indice.por_sala.append(celulas_salas[inicio:inicio + tamanho])
+            inicio += tamanho
+        return indice
+
+    # Converte um índice da grade de volta para (y, x)
+    def posicao(self, celula):
+        return divmod(celula, self.largura)
+
+    # Sorteia um tile de chão qualquer
+    def aleatoria(self, rng=random):
+        return self.posicao(self.celulas[rng.randrange(len(self.celulas))])
+
+    # Sorteia um tile de chão dentro da sala de índice indice_sala
+    def aleatoria_na_sala(self, indice_sala, rng=random):
+        celulas = self.por_sala[indice_sala]
+        return self.posicao(celulas[rng.randrange(len(celulas))])
+
+    # Sorteia (com a mesma chance para todos) um tile de chão cuja distância ao jogador
+    # seja maior que distancia tanto na vertical quanto na horizontal; None se não houver nenhum
+    def longe_de(self, pos_jogador, distancia, rng=random):
+        y_jogador, x_jogador = pos_jogador
+        largura = self.largura
+
+        # Em mapas grandes quase todo tile serve, então alguns sorteios diretos costumam bastar
+        for _ in range(TENTATIVAS_RAPIDAS):
+            celula = self.celulas[rng.randrange(len(self.celulas))]
+            y, x = divmod(celula, largura)
+            if abs(y - y_jogador) > distancia and abs(x - x_jogador) > distancia:
+                return y, x
+
+        # Caso contrário, junta os candidatos balde a balde: baldes inteiros fora das faixas
+        # proibidas entram sem filtrar, baldes cortados pelas faixas são filtrados tile a tile
+        candidatos = []
+        total = 0
+        for (balde_y, balde_x), celulas in self.baldes.items():
+            topo = balde_y * TAMANHO_BALDE
+            esquerda = balde_x * TAMANHO_BALDE
+            fundo = topo + TAMANHO_BALDE - 1
+            direita = esquerda + TAMANHO_BALDE - 1
+
+            linhas_livres = fundo < y_jogador - distancia or topo > y_jogador + distancia
+            colunas_livres = direita < x_jogador - distancia or esquerda > x_jogador + distancia
+            linhas_bloqueadas = topo >= y_jogador - distancia and fundo <= y_jogador + distancia
+            colunas_bloqueadas = esquerda >= x_jogador - distancia and direita <= x_jogador + distancia
+
+            if linhas_bloqueadas or colunas_bloqueadas:
+                continue
+            if not (linhas_livres and colunas_livres):
+                celulas = [celula for celula in celulas
+                           if abs(celula // largura - y_jogador) > distancia and abs(celula % largura - x_jogador) > distancia]
+                if not celulas:
+                    continue
+            candidatos.append(celulas)
+            total += len(celulas)
+
+        if not total:
+            return None
+
+        sorteio = rng.randrange(total)
+        for celulas in candidatos:
+            if sorteio < len(celulas):
+                return self.posicao(celulas[sorteio])
+            sorteio -= len(celulas)
+
+# Retorna o índice de piso da grade, montando-o na primeira vez se o gerador não o forneceu
+def obter_indice_piso(grade):
+    if grade.indice_piso is None:
+        grade.indice_piso = IndicePiso(grade)
+    return grade.indice_piso
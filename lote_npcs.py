@@ -0,0 +1,151 @@
+import random
+from array import array
+from grade import CHAO
+
+# Direções na mesma ordem usada por NPC.proximo_movimento: cima, baixo, esquerda, direita
+DIRECOES = ((-1, 0), (1, 0), (0, -1), (0, 1))
+CIMA, BAIXO, ESQUERDA, DIREITA = 1, 2, 4, 8
+TODAS_DIRECOES = CIMA | BAIXO | ESQUERDA | DIREITA
+
+# Para cada combinação de bits, as direções correspondentes em ordem (sorteadas com random.choice)
+DIRECOES_POR_MASCARA = tuple(
+    tuple(direcao for bit, direcao in enumerate(DIRECOES) if mascara & (1 << bit))
+    for mascara in range(16)
+)
+
+# Monta, para a grade inteira, um byte por tile com um bit para cada vizinho que é chão
+# Tudo é feito com fatias e operações sobre inteiros grandes, sem laço em Python por tile
+def mascara_vizinhos(grade):
+    largura = grade.largura
+    total = len(grade.celulas)
+
+    tabela_chao = bytearray(256)
+    tabela_chao[CHAO] = 1
+    chao = grade.celulas.translate(tabela_chao)
+
+    vizinho_cima = bytes(largura) + chao[:total - largura]
+    vizinho_baixo = chao[largura:] + bytes(largura)
+    vizinho_esquerda = bytearray(b"\0" + chao[:total - 1])
+    vizinho_esquerda[0::largura] = bytes(len(range(0, total, largura)))
+    vizinho_direita = bytearray(chao[1:] + b"\0")
+    vizinho_direita[largura - 1::largura] = bytes(len(range(largura - 1, total, largura)))
+
+    mascara = 0
+    for bit, vizinho in ((CIMA, vizinho_cima), (BAIXO, vizinho_baixo), (ESQUERDA, vizinho_esquerda), (DIREITA, vizinho_direita)):
+        tabela_bit = bytearray(256)
+        tabela_bit[1] = bit
+        mascara |= int.from_bytes(bytes(vizinho).translate(tabela_bit), "big")
+    return bytearray(mascara.to_bytes(total, "big"))
+
+# Estado de todos os NPCs de um nível guardado em arrays (uma coluna por atributo)
+# A atualização percorre os arrays de uma vez, usando a máscara de vizinhos e tabelas prontas
+class LoteNPCs:
+    def __init__(self, grade):
+        self.largura = grade.largura
+        self.mascara = mascara_vizinhos(grade)
+        self.ocupacao = bytearray(len(grade.celulas))
+
+        self.y = array("i")
+        self.x = array("i")
+        self.velocidade = array("B")
+        self.raio_deteccao = array("B")
+        self.contador_movimento = array("B")
+
+        # Objetos NPC correspondentes a cada posição dos arrays (símbolo e registro espacial)
+        self.npcs = []
+        self.indices = {}
+        # NPCs que entraram, saíram ou andaram dentro da região passada ao último atualizar
+        self.movidos_na_regiao = 0
+
+    def __len__(self):
+        return len(self.npcs)
+
+    # Copia o estado de um NPC para os arrays do lote
+    def adicionar(self, npc):
+        self.indices[npc] = len(self.npcs)
+        self.npcs.append(npc)
+        self.y.append(npc.y)
+        self.x.append(npc.x)
+        self.velocidade.append(npc.velocidade)
+        self.raio_deteccao.append(npc.raio_deteccao)
+        self.contador_movimento.append(npc.contador_movimento)
+        self.ocupacao[npc.y * self.largura + npc.x] = 1
+
+    # Move um NPC diretamente para (y, x), fora do ritmo normal (ex.: quando o jogador foge)
+    def reposicionar(self, npc, y, x):
+        i = self.indices[npc]
+        self.ocupacao[self.y[i] * self.largura + self.x[i]] = 0
+        self.ocupacao[y * self.largura + x] = 1
+        self.y[i] = y
+        self.x[i] = x
+        npc.y, npc.x = y, x
+
+    # Executa um tick para todos os NPCs, com o mesmo comportamento de NPC.mover
+    # Com um campo de fluxo, NPCs perseguindo o jogador seguem o caminho mais curto até ele
+    # Com regiao (topo, esquerda, fundo, direita), conta também os passos que começam ou terminam nela
+    # Retorna quantos NPCs mudaram de posição
+    def atualizar(self, pos_jogador, registro=None, rng=random, campo=None, regiao=None):
+        jogador_y, jogador_x = pos_jogador
+        largura = self.largura
+        mascara = self.mascara
+        ocupacao = self.ocupacao
+        ys, xs = self.y, self.x
+        velocidades = self.velocidade
+        raios = self.raio_deteccao
+        contadores = self.contador_movimento
+        escolher = rng.choice
+        descida = campo.descida if campo is not None else None
+        topo, esquerda, fundo, direita = regiao if regiao is not None else (1, 1, 0, 0)
+        movidos = 0
+        na_regiao = 0
+
+        for i in range(len(self.npcs)):
+            contador = contadores[i] + 1
+            if contador < velocidades[i]:
+                contadores[i] = contador
+                continue
+            contadores[i] = 0
+
+            y = ys[i]
+            x = xs[i]
+            indice = y * largura + x
+            if abs(y - jogador_y) + abs(x - jogador_x) <= raios[i]:
+                desejadas = descida[indice] if descida is not None else 0
+                if not desejadas:
+                    desejadas = ((CIMA if y > jogador_y else 0) | (BAIXO if y < jogador_y else 0) |
+                                 (ESQUERDA if x > jogador_x else 0) | (DIREITA if x < jogador_x else 0))
+            else:
+                desejadas = TODAS_DIRECOES
+
+            validas = desejadas & mascara[indice]
+            # Descarta vizinhos ocupados por outros NPCs
+            if validas & CIMA and ocupacao[indice - largura]:
+                validas ^= CIMA
+            if validas & BAIXO and ocupacao[indice + largura]:
+                validas ^= BAIXO
+            if validas & ESQUERDA and ocupacao[indice - 1]:
+                validas ^= ESQUERDA
+            if validas & DIREITA and ocupacao[indice + 1]:
+                validas ^= DIREITA
+            if not validas:
+                continue
+
+            dy, dx = escolher(DIRECOES_POR_MASCARA[validas])
+            ocupacao[indice] = 0
+            ocupacao[indice + dy * largura + dx] = 1
+            if (topo <= y <= fundo and esquerda <= x <= direita or
+                    topo <= y + dy <= fundo and esquerda <= x + dx <= direita):
+                na_regiao += 1
+            y += dy
+            x += dx
+            ys[i] = y
+            xs[i] = x
+
+            npc = self.npcs[i]
+            if registro is not None:
+                registro.mover(npc, y, x)
+            npc.y, npc.x = y, x
+            movidos += 1
+
+        self.movidos_na_regiao = na_regiao
+        return movidos
@@ -0,0 +1,165 @@
+import struct
+import zlib
+from grade import CLASSE_TILE, TILE_CAMINHAVEL, PAREDE
+
+# Identificação e versão do formato binário do mapa explorado
+MAGICO = b"TPME"
+VERSAO_FORMATO = 2
+
+# Cabeçalho: mágico, versão, largura e altura; o resto é comprimido com zlib
+CABECALHO = struct.Struct("<4sHII")
+
+# Vizinhos de um tile (dy, dx) usados para marcar as bordas
+VIZINHOS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Copia o retângulo (topo, esquerda, altura, largura) de um conjunto de bits com bytes_origem bytes por linha
+# para um novo conjunto começando na coluna 0; com esquerda múltipla de 8 cada linha é uma fatia
+def recortar_bits(bits, bytes_origem, topo, esquerda, altura, largura):
+    bytes_linha = (largura + 7) // 8
+    recorte = bytearray(bytes_linha * altura)
+    for y in range(altura):
+        inicio = (topo + y) * bytes_origem
+        if esquerda % 8 == 0:
+            linha = bits[inicio + esquerda // 8:inicio + esquerda // 8 + bytes_linha]
+            if largura % 8:
+                linha[-1] &= (1 << (largura % 8)) - 1
+            recorte[y * bytes_linha:(y + 1) * bytes_linha] = linha
+        else:
+            for x in range(largura):
+                coluna = esquerda + x
+                if bits[inicio + (coluna >> 3)] >> (coluna & 7) & 1:
+                    recorte[y * bytes_linha + (x >> 3)] |= 1 << (x & 7)
+    return recorte
+
+# Copia um conjunto de bits (largura x altura) para dentro de outro, com o canto em (topo, esquerda)
+def colar_bits(destino, bytes_destino, origem, largura, altura, topo, esquerda):
+    bytes_linha = (largura + 7) // 8
+    for y in range(altura):
+        inicio = (topo + y) * bytes_destino
+        if esquerda % 8 == 0 and largura % 8 == 0:
+            destino[inicio + esquerda // 8:inicio + esquerda // 8 + bytes_linha] = origem[y * bytes_linha:(y + 1) * bytes_linha]
+        else:
+            for x in range(largura):
+                coluna = esquerda + x
+                bit = 1 << (coluna & 7)
+                if origem[y * bytes_linha + (x >> 3)] >> (x & 7) & 1:
+                    destino[inicio + (coluna >> 3)] |= bit
+                else:
+                    destino[inicio + (coluna >> 3)] &= ~bit
+
+# Memória do que o jogador já viu em um nível: um bit por tile (explorado ou não) e o código do tile
+# como estava na última vez em que foi visto (0 se nunca foi visto)
+# Mantém também as bordas: um bit para cada tile vizinho de um tile de chão já explorado, que é o que
+# decide se uma parede lembrada aparece na tela; ele só muda quando um tile novo é explorado
+# Cada linha dos conjuntos de bits começa em um byte novo, para recortes alinhados serem só fatias
+class MapaExplorado:
+    __slots__ = ("largura", "altura", "bytes_linha", "bits", "bordas", "ultima_visao")
+
+    def __init__(self, largura, altura, bits=None, ultima_visao=None, bordas=None):
+        self.largura = largura
+        self.altura = altura
+        self.bytes_linha = (largura + 7) // 8
+        self.bits = bits if bits is not None else bytearray(self.bytes_linha * altura)
+        self.bordas = bordas if bordas is not None else bytearray(self.bytes_linha * altura)
+        self.ultima_visao = ultima_visao if ultima_visao is not None else bytearray(largura * altura)
+
+    # Verifica se o tile (y, x) já foi visto
+    def explorado(self, y, x):
+        return self.bits[y * self.bytes_linha + (x >> 3)] >> (x & 7) & 1
+
+    # Verifica se o tile (y, x) é vizinho de algum tile de chão já explorado
+    def borda(self, y, x):
+        return self.bordas[y * self.bytes_linha + (x >> 3)] >> (x & 7) & 1
+
+    # Código do tile (y, x) na última vez em que foi visto
+    def ultimo(self, y, x):
+        return self.ultima_visao[y * self.largura + x]
+
+    # Códigos lembrados de largura tiles da linha y a partir de esquerda, com 0 onde não há nada a mostrar
+    # Paredes fora de visiveis só aparecem se forem vizinhas de chão já explorado
+    def linha_lembrada(self, y, esquerda, largura, visiveis):
+        inicio = y * self.largura + esquerda
+        linha = self.ultima_visao[inicio:inicio + largura]
+        x = linha.find(PAREDE)
+        while x >= 0:
+            if (y, esquerda + x) not in visiveis and not self.borda(y, esquerda + x):
+                linha[x] = 0
+            x = linha.find(PAREDE, x + 1)
+        return linha
+
+    # Marca os quatro vizinhos de (y, x) como bordas
+    def _marcar_bordas(self, y, x):
+        bordas = self.bordas
+        bytes_linha = self.bytes_linha
+        for dy, dx in VIZINHOS:
+            ny, nx = y + dy, x + dx
+            if 0 <= ny < self.altura and 0 <= nx < self.largura:
+                bordas[ny * bytes_linha + (nx >> 3)] |= 1 << (nx & 7)
+
+    # Junta de uma vez o conjunto de tiles visíveis (pares (y, x)) ao mapa, copiando os códigos mostrados
+    # no quadro (QuadroVisual); as bordas são atualizadas só para os tiles explorados agora, conforme a
+    # classe do tile no mapa base (a dungeon sem personagens)
+    def registrar(self, visiveis, quadro):
+        bits = self.bits
+        bytes_linha = self.bytes_linha
+        ultima_visao = self.ultima_visao
+        celulas_base = quadro.base.celulas
+        sobreposicao = quadro.sobreposicao
+        fundo = quadro.fundo
+        largura = self.largura
+        for y, x in visiveis:
+            indice = y * largura + x
+            codigo = sobreposicao.get(indice)
+            if codigo is None:
+                codigo = celulas_base[indice] if fundo is None else fundo
+            ultima_visao[indice] = codigo
+            byte = y * bytes_linha + (x >> 3)
+            bit = 1 << (x & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                if CLASSE_TILE[celulas_base[indice]] & TILE_CAMINHAVEL:
+                    self._marcar_bordas(y, x)
+
+    # Quantidade de tiles já vistos
+    def total_explorado(self):
+        return sum(bin(byte).count("1") for byte in self.bits)
+
+    # Retorna um novo mapa com o retângulo dado
+    def recorte(self, topo, esquerda, altura, largura):
+        ultima_visao = bytearray()
+        for y in range(topo, topo + altura):
+            inicio = y * self.largura + esquerda
+            ultima_visao += self.ultima_visao[inicio:inicio + largura]
+        return MapaExplorado(largura, altura,
+                             recortar_bits(self.bits, self.bytes_linha, topo, esquerda, altura, largura),
+                             ultima_visao,
+                             recortar_bits(self.bordas, self.bytes_linha, topo, esquerda, altura, largura))
+
+    # Copia outro mapa para dentro deste, com o canto superior esquerdo em (topo, esquerda)
+    def colar(self, outro, topo, esquerda):
+        for y in range(outro.altura):
+            inicio = (topo + y) * self.largura + esquerda
+            self.ultima_visao[inicio:inicio + outro.largura] = outro.ultima_visao[y * outro.largura:(y + 1) * outro.largura]
+        colar_bits(self.bits, self.bytes_linha, outro.bits, outro.largura, outro.altura, topo, esquerda)
+        colar_bits(self.bordas, self.bytes_linha, outro.bordas, outro.largura, outro.altura, topo, esquerda)
+
+    # Serializa o mapa em um formato binário compacto (a maior parte de um mapa é zero e comprime bem)
+    def para_bytes(self):
+        cabecalho = CABECALHO.pack(MAGICO, VERSAO_FORMATO, self.largura, self.altura)
+        return cabecalho + zlib.compress(bytes(self.bits) + bytes(self.bordas) + bytes(self.ultima_visao))
+
+    # Reconstrói um mapa a partir de qualquer buffer no formato de para_bytes
+    @staticmethod
+    def de_buffer(buffer):
+        dados = memoryview(buffer)
+        magico, versao, largura, altura = CABECALHO.unpack_from(dados, 0)
+        if magico != MAGICO or versao != VERSAO_FORMATO:
+            raise ValueError("Formato de mapa explorado desconhecido")
+
+        conteudo = zlib.decompress(dados[CABECALHO.size:])
+        tamanho_bits = (largura + 7) // 8 * altura
+        if len(conteudo) != 2 * tamanho_bits + largura * altura:
+            raise ValueError("Mapa explorado com tamanho inválido")
+        return MapaExplorado(largura, altura, bytearray(conteudo[:tamanho_bits]),
+                             bytearray(conteudo[2 * tamanho_bits:]),
+                             bytearray(conteudo[tamanho_bits:2 * tamanho_bits]))
@@ -0,0 +1,159 @@
+import hashlib
+import random
+from collections import OrderedDict
+from bsp import gerar_nivel, criar_trecho_corredor
+from grade import GradeDungeon
+from indice_piso import IndicePiso
+from mapa_explorado import MapaExplorado
+from simulacao import DENSIDADE_SALAS
+
+# Tamanho de cada chunk, em tiles; maior que meia janela de visão, para a região ativa sempre cobrir a tela
+LARGURA_CHUNK = 80
+ALTURA_CHUNK = 32
+
+# Quantos chunks ficam em memória antes de o menos usado recentemente ser descartado
+MAX_CHUNKS = 64
+
+# Chunks carregados em volta do chunk do jogador em cada direção (1 = região de 3x3 chunks)
+RAIO_REGIAO = 1
+
+# Deriva uma semente de 32 bits da semente do mundo e de um rótulo com coordenadas
+# Não depende de hash() do Python, então o mesmo mundo sai igual em qualquer processo ou máquina
+def derivar_semente(semente, *partes):
+    texto = ":".join(str(parte) for parte in (semente,) + partes)
+    return int.from_bytes(hashlib.blake2b(texto.encode("ascii"), digest_size=4).digest(), "little")
+
+# Mundo sem limites dividido em chunks; cada chunk é um nível BSP gerado a partir da semente do mundo
+# e das suas coordenadas, com portas nas bordas ligando-o aos vizinhos
+# Os chunks são gerados sob demanda e os menos usados são descartados (podem ser gerados de novo, iguais)
+class MundoEmChunks:
+    def __init__(self, semente=None, densidade=DENSIDADE_SALAS, largura_chunk=LARGURA_CHUNK,
+                 altura_chunk=ALTURA_CHUNK, max_chunks=MAX_CHUNKS):
+        if semente is None:
+            semente = random.getrandbits(32)
+        self.semente = semente
+        self.densidade = densidade
+        self.largura_chunk = largura_chunk
+        self.altura_chunk = altura_chunk
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.gerados = 0
+        # Memória do jogador em cada chunk visitado, já serializada e comprimida (MapaExplorado.para_bytes)
+        # Fica guardada mesmo quando o chunk sai do cache; comprimida, um chunk visitado ocupa uma fração
+        # dos bytes do mapa aberto, que só existe para os chunks da região carregada
+        self.explorados = {}
+        # Contador de alterações da memória e, para cada chunk, a alteração em que ela mudou por último
+        # (os deltas de salvamento levam só os chunks alterados depois do salvamento completo)
+        self.alteracoes = 0
+        self.alterado_em = {}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    # Linha da porta na borda entre o chunk (cy, cx) e o vizinho da direita
+    def porta_leste(self, cy, cx):
+        return 1 + derivar_semente(self.semente, "leste", cy, cx) % (self.altura_chunk - 2)
+
+    # Coluna da porta na borda entre o chunk (cy, cx) e o vizinho de baixo
+    def porta_sul(self, cy, cx):
+        return 1 + derivar_semente(self.semente, "sul", cy, cx) % (self.largura_chunk - 2)
+
+    # Gera o chunk (cy, cx) e escava corredores da sala mais próxima até cada uma das quatro portas
+    # Cada porta é calculada igual pelos dois chunks que dividem a borda, então os corredores se encontram
+    def gerar_chunk(self, cy, cx):
+        largura, altura = self.largura_chunk, self.altura_chunk
+        nivel = gerar_nivel(largura, altura, self.densidade, derivar_semente(self.semente, "chunk", cy, cx))
+        grade = nivel.grade
+
+        portas = (
+            (self.porta_leste(cy, cx - 1), 0),
+            (self.porta_leste(cy, cx), largura - 1),
+            (0, self.porta_sul(cy - 1, cx)),
+            (altura - 1, self.porta_sul(cy, cx)),
+        )
+        for porta_y, porta_x in portas:
+            # Sem salas no chunk, todas as portas se encontram no centro
+            if nivel.salas:
+                sala = min(nivel.salas, key=lambda s: abs(s.centro()[0] - porta_x) + abs(s.centro()[1] - porta_y))
+                destino_x, destino_y = sala.centro()
+            else:
+                destino_x, destino_y = largura // 2, altura // 2
+
+            # Sai da porta perpendicular à borda e depois vira em direção à sala
+            if porta_x in (0, largura - 1):
+                trechos = ((porta_x, porta_y, destino_x, porta_y), (destino_x, porta_y, destino_x, destino_y))
+            else:
+                trechos = ((porta_x, porta_y, porta_x, destino_y), (porta_x, destino_y, destino_x, destino_y))
+            for trecho in trechos:
+                criar_trecho_corredor(grade, *trecho)
+                nivel.corredores.append(trecho)
+
+        grade.indice_piso = IndicePiso(grade, nivel.salas)
+        return nivel
+
+    # Retorna o nível do chunk (cy, cx), gerando-o se preciso e marcando-o como usado recentemente
+    def chunk(self, cy, cx):
+        chave = (cy, cx)
+        nivel = self.chunks.get(chave)
+        if nivel is None:
+            nivel = self.chunks[chave] = self.gerar_chunk(cy, cx)
+            self.gerados += 1
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(chave)
+        return nivel
+
+    # Chunk que contém a coordenada de mundo (y, x); coordenadas negativas também valem
+    def chunk_de(self, y, x):
+        return y // self.altura_chunk, x // self.largura_chunk
+
+    # Monta uma grade comum com os chunks em volta de (cy, cx), para a simulação e a tela usarem como um nível
+    # Retorna a grade e a coordenada de mundo (topo, esquerda) do seu canto superior esquerdo
+    def regiao(self, cy, cx, raio=RAIO_REGIAO):
+        lado = 2 * raio + 1
+        linhas_chunks = [[self.chunk(cy + dy, cx + dx).grade for dx in range(-raio, raio + 1)]
+                         for dy in range(-raio, raio + 1)]
+
+        celulas = bytearray()
+        for grades in linhas_chunks:
+            for y in range(self.altura_chunk):
+                for grade in grades:
+                    celulas += grade.linha(y)
+
+        grade = GradeDungeon(lado * self.largura_chunk, lado * self.altura_chunk, celulas=celulas)
+        origem = ((cy - raio) * self.altura_chunk, (cx - raio) * self.largura_chunk)
+        return grade, origem
+
+    # Monta a memória da região em volta de (cy, cx) a partir da memória guardada de cada chunk
+    def explorado_regiao(self, cy, cx, raio=RAIO_REGIAO):
+        lado = 2 * raio + 1
+        explorado = MapaExplorado(lado * self.largura_chunk, lado * self.altura_chunk)
+        for dy in range(-raio, raio + 1):
+            for dx in range(-raio, raio + 1):
+                dados = self.explorados.get((cy + dy, cx + dx))
+                if dados is not None:
+                    explorado.colar(MapaExplorado.de_buffer(dados), (dy + raio) * self.altura_chunk, (dx + raio) * self.largura_chunk)
+        return explorado
+
+    # Guarda a memória de uma região (montada por explorado_regiao) de volta, chunk a chunk
+    # Chunks que o jogador nunca viu não ocupam espaço; só os que mudaram ganham uma alteração nova
+    def guardar_explorado(self, explorado, cy, cx, raio=RAIO_REGIAO):
+        for dy in range(-raio, raio + 1):
+            for dx in range(-raio, raio + 1):
+                parte = explorado.recorte((dy + raio) * self.altura_chunk, (dx + raio) * self.largura_chunk,
+                                          self.altura_chunk, self.largura_chunk)
+                if not any(parte.bits):
+                    continue
+                # A compressão é determinística: mesmo conteúdo, mesmos bytes
+                chave = (cy + dy, cx + dx)
+                dados = parte.para_bytes()
+                if self.explorados.get(chave) == dados:
+                    continue
+                self.explorados[chave] = dados
+                self.alteracoes += 1
+                self.alterado_em[chave] = self.alteracoes
+
+    # Chunks cuja memória mudou depois da alteração de número desde
+    def alterados_desde(self, desde):
+        return [chave for chave, alteracao in self.alterado_em.items() if alteracao > desde]
@@ -0,0 +1,97 @@
+import struct
+from array import array
+from itertools import chain
+from binario import array_para_bytes, array_de_buffer
+from grade import GradeDungeon
+from indice_piso import IndicePiso
+
+# Identificação e versão do formato binário dos níveis
+MAGICO = b"TPNV"
+VERSAO_FORMATO = 1
+
+# Cabeçalho: mágico, versão, largura, altura, semente (-1 se desconhecida), densidade e quantidades
+# de salas, trechos de corredor e nós da árvore; tudo em little-endian
+CABECALHO = struct.Struct("<4sHIIqdIII")
+
+# Campos inteiros de cada registro de sala, corredor e nó da árvore
+CAMPOS_SALA = 4
+CAMPOS_CORREDOR = 4
+CAMPOS_NO = 7
+
+# Classe que representa uma sala retangular
+class Sala:
+    def __init__(self, x, y, largura, altura):
+        self.x = x
+        self.y = y
+        self.largura = largura
+        self.altura = altura
+
+    # Retorna o centro da sala
+    def centro(self):
+        return (self.x + self.largura // 2, self.y + self.altura // 2)
+
+    # Verifica se esta sala intersecta outra
+    def intersecta(self, outra):
+        return not (
+            self.x + self.largura < outra.x or
+            self.x > outra.x + outra.largura or
+            self.y + self.altura < outra.y or
+            self.y > outra.y + outra.altura
+        )
+
+# Nível gerado: grade, salas, trechos de corredor (x1, y1, x2, y2) e árvore BSP achatada
+class Nivel:
+    def __init__(self, grade, salas, corredores, arvore, semente=None, densidade=0.0):
+        self.grade = grade
+        self.salas = salas
+        self.corredores = corredores
+        self.arvore = arvore
+        self.semente = semente
+        self.densidade = densidade
+
+    # Serializa o nível no formato binário compacto
+    def para_bytes(self):
+        semente = self.semente if self.semente is not None and 0 <= self.semente < 2 ** 63 else -1
+        cabecalho = CABECALHO.pack(MAGICO, VERSAO_FORMATO, self.grade.largura, self.grade.altura, semente,
+                                   self.densidade, len(self.salas), len(self.corredores), len(self.arvore))
+
+        salas = array("i", chain.from_iterable((sala.x, sala.y, sala.largura, sala.altura) for sala in self.salas))
+        corredores = array("i", chain.from_iterable(self.corredores))
+        arvore = array("i", chain.from_iterable(self.arvore))
+
+        return b"".join((cabecalho, self.grade.celulas, array_para_bytes(salas), array_para_bytes(corredores),
+                         array_para_bytes(arvore)))
+
+    # Reconstrói um nível a partir de qualquer buffer (bytes, memoryview, mmap) no formato binário
+    # Com indexar=False o índice de piso fica para quem chamou (ex.: um índice já serializado)
+    # Buffers de outro formato ou truncados geram ValueError
+    @staticmethod
+    def de_buffer(buffer, indexar=True):
+        dados = memoryview(buffer)
+        if len(dados) < CABECALHO.size:
+            raise ValueError("Nível truncado")
+        (magico, versao, largura, altura, semente, densidade,
+         total_salas, total_corredores, total_nos) = CABECALHO.unpack_from(dados, 0)
+        if magico != MAGICO or versao != VERSAO_FORMATO:
+            raise ValueError("Formato de nível desconhecido")
+
+        posicao = CABECALHO.size
+        if posicao + largura * altura > len(dados):
+            raise ValueError("Nível truncado")
+        celulas = bytearray(dados[posicao:posicao + largura * altura])
+        posicao += largura * altura
+
+        # Lê uma seção de registros inteiros e a divide em tuplas de campos
+        def ler_registros(quantidade, campos):
+            nonlocal posicao
+            registros, posicao = array_de_buffer(dados, posicao, "i", quantidade * campos)
+            return list(zip(*[iter(registros)] * campos))
+
+        salas = [Sala(*registro) for registro in ler_registros(total_salas, CAMPOS_SALA)]
+        corredores = ler_registros(total_corredores, CAMPOS_CORREDOR)
+        arvore = ler_registros(total_nos, CAMPOS_NO)
+
+        grade = GradeDungeon(largura, altura, celulas=celulas)
+        if indexar:
+            grade.indice_piso = IndicePiso(grade, salas)
+        return Nivel(grade, salas, corredores, arvore, None if semente < 0 else semente, densidade)
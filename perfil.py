@@ -0,0 +1,159 @@
+import cProfile
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from logging.handlers import RotatingFileHandler
+
+# Modos ligados pela variável de ambiente TEMPLO_PERFIL, separados por vírgula:
+#   painel   - mostra os tempos e contadores no painel lateral
+#   log      - grava um resumo periódico em um log rotativo
+#   cprofile - perfila o jogo inteiro com cProfile e grava as estatísticas ao sair
+# "1" equivale a "painel"; sem a variável, nada é medido
+MODOS = ("painel", "log", "cprofile")
+
+# Prefixo dos arquivos gerados (.log e .prof), trocado pela variável TEMPLO_PERFIL_SAIDA
+SAIDA_PADRAO = os.environ.get("TEMPLO_PERFIL_SAIDA", "templo-perfil")
+
+# Quadros considerados nas médias do painel e em cada linha do log
+QUADROS_POR_JANELA = 60
+
+# Tamanho máximo de cada arquivo do log e quantos arquivos antigos são mantidos
+TAMANHO_LOG = 1024 * 1024
+ARQUIVOS_LOG = 3
+
+# Mede um trecho nomeado e soma o tempo ao quadro atual do perfil
+class Trecho:
+    __slots__ = ("perfil", "nome", "inicio")
+
+    def __init__(self, perfil, nome):
+        self.perfil = perfil
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        tempos = self.perfil.tempos
+        tempos[self.nome] = tempos.get(self.nome, 0.0) + time.perf_counter() - self.inicio
+
+# Instrumentação do jogo: tempos por trecho e contadores, agrupados por quadro
+class Perfil:
+    ativo = True
+
+    def __init__(self, painel=True, log=False, cprofile=False, saida=SAIDA_PADRAO):
+        self.painel = painel
+        self.tempos = {}
+        self.contadores = {}
+        self.janela = deque(maxlen=QUADROS_POR_JANELA)
+        self.quadros = 0
+        self.saida = saida
+
+        self.log = None
+        if log:
+            self.log = logging.getLogger("templo.perfil")
+            self.log.setLevel(logging.INFO)
+            self.log.propagate = False
+            self.log.addHandler(RotatingFileHandler(saida + ".log", maxBytes=TAMANHO_LOG, backupCount=ARQUIVOS_LOG))
+        self.perfilador = cProfile.Profile() if cprofile else None
+
+    # Começa a medir (o cProfile só roda entre iniciar e encerrar)
+    def iniciar(self):
+        if self.perfilador is not None:
+            self.perfilador.enable()
+
+    # Para de medir e grava as estatísticas do cProfile
+    def encerrar(self):
+        if self.perfilador is not None:
+            self.perfilador.disable()
+            self.perfilador.dump_stats(self.saida + ".prof")
+        if self.log is not None:
+            for handler in self.log.handlers:
+                handler.flush()
+
+    # Gerenciador de contexto que mede um trecho: with PERFIL.trecho("fov"): ...
+    def trecho(self, nome):
+        return Trecho(self, nome)
+
+    # Soma uma quantidade a um contador do quadro atual
+    def contar(self, nome, quantidade=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    # Fecha o quadro atual: guarda os tempos e contadores na janela e, a cada janela completa, grava no log
+    def fim_quadro(self):
+        self.janela.append((self.tempos, self.contadores))
+        self.tempos = {}
+        self.contadores = {}
+        self.quadros += 1
+        if self.log is not None and self.quadros % QUADROS_POR_JANELA == 0:
+            self.log.info(json.dumps(self.resumo(), sort_keys=True))
+
+    # Médias e máximos (em ms) de cada trecho e médias dos contadores na janela de quadros recentes
+    def resumo(self):
+        trechos = {}
+        contadores = {}
+        for tempos, quantidades in self.janela:
+            for nome, tempo in tempos.items():
+                trechos.setdefault(nome, []).append(tempo)
+            for nome, quantidade in quantidades.items():
+                contadores[nome] = contadores.get(nome, 0) + quantidade
+
+        total = len(self.janela) or 1
+        return {
+            "quadros": self.quadros,
+            "trechos": {nome: {"media_ms": round(sum(valores) / total * 1000, 3), "max_ms": round(max(valores) * 1000, 3)}
+                        for nome, valores in trechos.items()},
+            "contadores": {nome: round(soma / total, 1) for nome, soma in contadores.items()},
+        }
+
+    # Texto para o painel lateral (vazio se o painel não foi pedido)
+    def texto_painel(self):
+        if not self.painel:
+            return ""
+        resumo = self.resumo()
+        linhas = [f"Perfil ({len(self.janela)} quadros)"]
+        for nome, medida in resumo["trechos"].items():
+            linhas.append(f"{nome:<10} {medida['media_ms']:>7.3f} ms  max {medida['max_ms']:>7.3f}")
+        for nome, media in resumo["contadores"].items():
+            linhas.append(f"{nome:<16} {media:>8.1f}/quadro")
+        return "\n".join(linhas)
+
+# Versão desligada: mesma interface, sem medir nada; trecho devolve sempre o mesmo contexto vazio
+class PerfilDesligado:
+    ativo = False
+    painel = False
+    _nulo = nullcontext()
+
+    def iniciar(self):
+        pass
+
+    def encerrar(self):
+        pass
+
+    def trecho(self, nome):
+        return self._nulo
+
+    def contar(self, nome, quantidade=1):
+        pass
+
+    def fim_quadro(self):
+        pass
+
+    def texto_painel(self):
+        return ""
+
+# Cria o perfil conforme o valor de TEMPLO_PERFIL (ex.: "painel,log")
+def criar_perfil(valor):
+    modos = {modo.strip() for modo in valor.lower().split(",") if modo.strip()}
+    if "1" in modos:
+        modos.discard("1")
+        modos.add("painel")
+    if not modos & set(MODOS):
+        return PerfilDesligado()
+    return Perfil("painel" in modos, "log" in modos, "cprofile" in modos)
+
+# Perfil usado pelo jogo inteiro
+PERFIL = criar_perfil(os.environ.get("TEMPLO_PERFIL", ""))
@@ -0,0 +1,123 @@
+import random
+from random import choice
+from indice_piso import obter_indice_piso
+
+# Distância mínima (na vertical e na horizontal) entre o jogador e um inimigo recém-posicionado
+DISTANCIA_INIMIGO = 10
+# Sorteios de posição livre antes de desistir do sorteio direto e listar os tiles livres
+TENTATIVAS_LIVRE = 32
+
+# Classe para representar um NPC inimigo genérico
+# A velocidade é o número de ticks da simulação entre dois passos do NPC
+class NPC:
+    def __init__(self, y, x, velocidade=2, raio_deteccao=8, simbolo="N"):
+        self.y = y
+        self.x = x
+        self.velocidade = velocidade
+        self.raio_deteccao = raio_deteccao
+        self.contador_movimento = 0
+        self.simbolo = simbolo
+
+    # Verifica se o jogador está perto o suficiente para o NPC reagir
+    def perto_do_jogador(self, pos_jogador):
+        jogador_y, jogador_x = pos_jogador
+        return abs(self.y - jogador_y) + abs(self.x - jogador_x) <= self.raio_deteccao
+
+    # Decide o próximo movimento do NPC com base na posição do jogador
+    # Com um registro de entidades, tiles ocupados por outros NPCs também são evitados
+    # Com um campo de fluxo, o NPC persegue o jogador pelo caminho mais curto em vez de ir em linha reta
+    def proximo_movimento(self, dungeon, pos_jogador, registro=None, campo=None):
+        movimentos_possiveis = []
+        if self.perto_do_jogador(pos_jogador):
+            jogador_y, jogador_x = pos_jogador
+            if campo is not None:
+                movimentos_possiveis = campo.passos(self.y, self.x)
+            # Fora do alcance do campo, aproxima-se eixo a eixo
+            if not movimentos_possiveis:
+                if self.y > jogador_y:
+                    movimentos_possiveis.append((self.y - 1, self.x))
+                if self.y < jogador_y:
+                    movimentos_possiveis.append((self.y + 1, self.x))
+                if self.x > jogador_x:
+                    movimentos_possiveis.append((self.y, self.x - 1))
+                if self.x < jogador_x:
+                    movimentos_possiveis.append((self.y, self.x + 1))
+        else:
+            movimentos_possiveis = [(self.y + dy, self.x + dx) for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+
+        movimentos_validos = [(y, x) for y, x in movimentos_possiveis
+                              if dungeon.caminhavel(y, x) and not (registro is not None and registro.ocupado(y, x))]
+        return choice(movimentos_validos) if movimentos_validos else (self.y, self.x)
+
+    # Atualiza a posição do NPC baseado em sua velocidade (chamado uma vez por tick)
+    # Retorna True se o NPC mudou de posição
+    def mover(self, dungeon, pos_jogador, registro=None, campo=None):
+        self.contador_movimento += 1
+        if self.contador_movimento >= self.velocidade:
+            self.contador_movimento = 0
+            novo_y, novo_x = self.proximo_movimento(dungeon, pos_jogador, registro, campo)
+            if (novo_y, novo_x) != (self.y, self.x):
+                if registro is not None:
+                    registro.mover(self, novo_y, novo_x)
+                self.y, self.x = novo_y, novo_x
+                return True
+        return False
+
+# Subclasses para NPCs rápidos e lentos
+class NPC_Rapido(NPC):
+    def __init__(self, y, x):
+        super().__init__(y, x, velocidade=1, raio_deteccao=12, simbolo="F")
+
+class NPC_Lento(NPC):
+    def __init__(self, y, x):
+        super().__init__(y, x, velocidade=3, raio_deteccao=8, simbolo="S")
+
+# Tipos de inimigo sorteados ao popular um nível
+TIPOS_NPC = [NPC, NPC_Rapido, NPC_Lento]
+
+# Classes para representar o jogador e subclasses de classes jogáveis
+class Jogador:
+    def __init__(self, nome, vida, usa_arma_distancia, usa_escudo):
+        self.nome = nome
+        self.vida = vida
+        self.usa_arma_distancia = usa_arma_distancia
+        self.usa_escudo = usa_escudo
+
+class Cavaleiro(Jogador):
+    def __init__(self, nome):
+        super().__init__(nome, vida=100, usa_arma_distancia=False, usa_escudo=True)
+
+class Patrulheiro(Jogador):
+    def __init__(self, nome):
+        super().__init__(nome, vida=80, usa_arma_distancia=True, usa_escudo=False)
+
+# Funções auxiliares para localizar posições vazias para personagens e objetos
+# Todas sorteiam a partir do índice de chão gerado junto com a dungeon
+# rng permite usar um gerador próprio (ex.: o de uma Simulacao) no lugar do módulo random
+def posicao_vazia_aleatoria(dungeon, rng=random):
+    return obter_indice_piso(dungeon).aleatoria(rng)
+
+def posicao_inimigo_longe_jogador(dungeon, pos_jogador, rng=random):
+    posicao = obter_indice_piso(dungeon).longe_de(pos_jogador, DISTANCIA_INIMIGO, rng)
+    return posicao if posicao else posicao_vazia_aleatoria(dungeon, rng)
+
+def posicao_item_longe_jogador(dungeon, pos_jogador, rng=random):
+    posicao = obter_indice_piso(dungeon).longe_de(pos_jogador, 20, rng)
+    return posicao if posicao else posicao_vazia_aleatoria(dungeon, rng)
+
+# Sorteia uma posição longe do jogador que não esteja ocupada por outro NPC
+# Depois de TENTATIVAS_LIVRE sorteios ocupados, escolhe entre os tiles livres que restam (os longes do jogador,
+# ou qualquer um se não houver); None se todo o chão estiver ocupado
+def posicao_inimigo_livre(dungeon, registro, pos_jogador, rng=random):
+    for _ in range(TENTATIVAS_LIVRE):
+        posicao = posicao_inimigo_longe_jogador(dungeon, pos_jogador, rng)
+        if not registro.ocupado(*posicao):
+            return posicao
+
+    indice = obter_indice_piso(dungeon)
+    y_jogador, x_jogador = pos_jogador
+    livres = [posicao for posicao in map(indice.posicao, indice.celulas)
+              if posicao != pos_jogador and not registro.ocupado(*posicao)]
+    longe = [(y, x) for y, x in livres if abs(y - y_jogador) > DISTANCIA_INIMIGO and abs(x - x_jogador) > DISTANCIA_INIMIGO]
+    candidatos = longe or livres
+    return rng.choice(candidatos) if candidatos else None
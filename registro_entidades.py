@@ -0,0 +1,80 @@
+# Lado (em tiles) de cada balde usado nas buscas por região
+TAMANHO_BALDE = 16
+
+# Registro espacial das entidades do mapa (NPCs), com no máximo uma entidade por tile
+class RegistroEntidades:
+    def __init__(self):
+        self.por_tile = {}
+        self.posicoes = {}
+        self.baldes = {}
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def __iter__(self):
+        return iter(self.posicoes)
+
+    # Coloca uma entidade no registro (o tile precisa estar livre)
+    def adicionar(self, entidade, y, x):
+        if (y, x) in self.por_tile:
+            raise ValueError(f"Tile ({y}, {x}) já está ocupado")
+        self.por_tile[(y, x)] = entidade
+        self.posicoes[entidade] = (y, x)
+        self.baldes.setdefault((y // TAMANHO_BALDE, x // TAMANHO_BALDE), set()).add(entidade)
+
+    # Tira uma entidade do registro
+    def remover(self, entidade):
+        y, x = self.posicoes.pop(entidade)
+        del self.por_tile[(y, x)]
+        chave = (y // TAMANHO_BALDE, x // TAMANHO_BALDE)
+        balde = self.baldes[chave]
+        balde.discard(entidade)
+        if not balde:
+            del self.baldes[chave]
+
+    # Atualiza a posição de uma entidade já registrada
+    def mover(self, entidade, y, x):
+        antiga = self.posicoes[entidade]
+        if antiga == (y, x):
+            return
+        if (y, x) in self.por_tile:
+            raise ValueError(f"Tile ({y}, {x}) já está ocupado")
+
+        del self.por_tile[antiga]
+        self.por_tile[(y, x)] = entidade
+        self.posicoes[entidade] = (y, x)
+
+        chave_antiga = (antiga[0] // TAMANHO_BALDE, antiga[1] // TAMANHO_BALDE)
+        chave_nova = (y // TAMANHO_BALDE, x // TAMANHO_BALDE)
+        if chave_antiga != chave_nova:
+            balde = self.baldes[chave_antiga]
+            balde.discard(entidade)
+            if not balde:
+                del self.baldes[chave_antiga]
+            self.baldes.setdefault(chave_nova, set()).add(entidade)
+
+    # Retorna a entidade no tile (y, x), ou None
+    def em(self, y, x):
+        return self.por_tile.get((y, x))
+
+    # Verifica se há alguma entidade no tile (y, x)
+    def ocupado(self, y, x):
+        return (y, x) in self.por_tile
+
+    # Retorna as entidades dentro do retângulo informado, consultando só os baldes que ele cobre
+    def na_regiao(self, topo, esquerda, altura, largura):
+        fundo = topo + altura - 1
+        direita = esquerda + largura - 1
+        encontradas = []
+        for balde_y in range(topo // TAMANHO_BALDE, fundo // TAMANHO_BALDE + 1):
+            for balde_x in range(esquerda // TAMANHO_BALDE, direita // TAMANHO_BALDE + 1):
+                for entidade in self.baldes.get((balde_y, balde_x), ()):
+                    y, x = self.posicoes[entidade]
+                    if topo <= y <= fundo and esquerda <= x <= direita:
+                        encontradas.append(entidade)
+        return encontradas
+
+    # Retorna as entidades a até raio passos (distância de Manhattan) de (y, x)
+    def no_raio(self, y, x, raio):
+        return [entidade for entidade in self.na_regiao(y - raio, x - raio, 2 * raio + 1, 2 * raio + 1)
+                if abs(self.posicoes[entidade][0] - y) + abs(self.posicoes[entidade][1] - x) <= raio]
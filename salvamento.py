@@ -0,0 +1,276 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from binario import array_para_bytes, array_de_buffer, gravar_atomicamente
+from nivel import Nivel
+from indice_piso import IndicePiso
+from mapa_explorado import MapaExplorado
+from mundo import MundoEmChunks
+from personagens import TIPOS_NPC, Jogador, Cavaleiro, Patrulheiro
+from simulacao import Simulacao
+
+# Identificação e versão do formato binário das partidas salvas
+MAGICO = b"TPSV"
+VERSAO_FORMATO = 3
+
+# Tipos de arquivo: a partida completa ou só o que muda durante o jogo (aplicado sobre uma completa)
+COMPLETO = 0
+DELTA = 1
+
+# Extensão do arquivo de delta, gravado ao lado do salvamento completo
+EXTENSAO_DELTA = ".delta"
+
+# Ticks entre dois salvamentos automáticos
+INTERVALO_AUTOSALVAMENTO = 40
+
+# Caminho padrão do salvamento (pode ser trocado pela variável de ambiente TEMPLO_SALVAMENTO)
+CAMINHO_PADRAO = os.environ.get(
+    "TEMPLO_SALVAMENTO", os.path.join(os.path.expanduser("~"), ".local", "share", "into-the-temple", "partida.sav"))
+
+# Cabeçalho: mágico, versão, tipo, identificador do salvamento completo (num delta, o da base) e CRC-32
+# das seções que vêm depois dele
+CABECALHO = struct.Struct("<4sHBII")
+
+# Cada seção é uma etiqueta de 4 bytes e o tamanho do conteúdo, seguidos do conteúdo
+SECAO = struct.Struct("<4sI")
+
+# Conteúdo das seções, tudo em little-endian
+PARTIDA = struct.Struct("<qQiiI")         # semente (-1 se não couber), ticks, posição do jogador, quantidade de NPCs
+JOGADOR = struct.Struct("<i??HB")         # vida, arma de distância, escudo, tamanhos do nome e da classe
+ESTADO_RNG = struct.Struct("<B?d")        # versão do estado, se há gauss_next guardado e o seu valor
+REGISTRO_NPC = struct.Struct("<iiBBBB")   # y, x, velocidade, raio de detecção, contador de movimento, tipo
+MUNDO = struct.Struct("<qdIII")           # semente, densidade, tamanho dos chunks e máximo em cache
+CHUNK_CENTRAL = struct.Struct("<ii")      # chunk no centro da região carregada (muda quando o jogador anda)
+CHUNK_EXPLORADO = struct.Struct("<iiI")   # coordenadas do chunk e tamanho do mapa explorado serializado
+
+# Seções que mudam durante o jogo e vão para os deltas; nível e mundo só entram no salvamento completo
+# As posições do jogador e dos NPCs são relativas à região do chunk central, por isso ele vai junto
+SECOES_DINAMICAS = (b"PART", b"JOGA", b"RNG_", b"NPCS", b"EXPL", b"CHNK")
+
+# Classes de jogador que podem ser restauradas, pelo nome
+CLASSES_JOGADOR = {classe.__name__: classe for classe in (Jogador, Cavaleiro, Patrulheiro)}
+
+# Serializa as seções que mudam durante o jogo
+# No modo com chunks, com desde (um MundoEmChunks.alteracoes anterior) a memória leva só os chunks
+# alterados depois dele; sem desde, leva todos
+def secoes_dinamicas(simulacao, desde=None):
+    semente = simulacao.semente if 0 <= simulacao.semente < 2 ** 63 else -1
+    partida = PARTIDA.pack(semente, simulacao.ticks, simulacao.jogador_y, simulacao.jogador_x,
+                           simulacao.quantidade_npcs)
+
+    jogador = simulacao.jogador
+    nome = jogador.nome.encode("utf-8")
+    classe = type(jogador).__name__.encode("ascii")
+    dados_jogador = JOGADOR.pack(jogador.vida, jogador.usa_arma_distancia, jogador.usa_escudo,
+                                 len(nome), len(classe)) + nome + classe
+
+    versao, palavras, gauss = simulacao.rng.getstate()
+    rng = ESTADO_RNG.pack(versao, gauss is not None, gauss or 0.0) + array_para_bytes(array("I", palavras))
+
+    # Os NPCs saem direto dos arrays do lote, que guardam o estado usado a cada tick
+    lote = simulacao.lote
+    npcs = bytearray(REGISTRO_NPC.size * len(lote))
+    for i, npc in enumerate(lote.npcs):
+        REGISTRO_NPC.pack_into(npcs, i * REGISTRO_NPC.size, lote.y[i], lote.x[i], lote.velocidade[i],
+                               lote.raio_deteccao[i], lote.contador_movimento[i], TIPOS_NPC.index(type(npc)))
+
+    secoes = {b"PART": partida, b"JOGA": dados_jogador, b"RNG_": rng, b"NPCS": bytes(npcs)}
+
+    # No modo com chunks, a memória vai chunk a chunk, para não depender da região carregada
+    if simulacao.mundo is not None:
+        mundo = simulacao.mundo
+        mundo.guardar_explorado(simulacao.explorado, *simulacao.chunk_central)
+        chaves = mundo.explorados if desde is None else mundo.alterados_desde(desde)
+        partes = []
+        for cy, cx in chaves:
+            dados = mundo.explorados[(cy, cx)]
+            partes.append(CHUNK_EXPLORADO.pack(cy, cx, len(dados)) + dados)
+        secoes[b"EXPL"] = struct.pack("<I", len(partes)) + b"".join(partes)
+        secoes[b"CHNK"] = CHUNK_CENTRAL.pack(*simulacao.chunk_central)
+    else:
+        secoes[b"EXPL"] = simulacao.explorado.para_bytes()
+    return secoes
+
+# Serializa a partida; um delta leva só as seções dinâmicas e o identificador da base a que se aplica
+# desde limita a memória dos chunks de um delta aos alterados depois da base (ver secoes_dinamicas)
+def para_bytes(simulacao, tipo=COMPLETO, base=0, desde=None):
+    secoes = secoes_dinamicas(simulacao, desde if tipo == DELTA else None)
+    if tipo == COMPLETO:
+        if simulacao.mundo is not None:
+            mundo = simulacao.mundo
+            secoes[b"MUND"] = MUNDO.pack(mundo.semente, mundo.densidade, mundo.largura_chunk, mundo.altura_chunk,
+                                         mundo.max_chunks)
+        else:
+            secoes[b"NIVL"] = simulacao.nivel.para_bytes()
+            # O índice de piso vai pronto: remontá-lo seria a parte mais lenta do carregamento
+            secoes[b"INDP"] = simulacao.nivel.grade.indice_piso.para_bytes()
+
+    corpo = b"".join(SECAO.pack(etiqueta, len(conteudo)) + conteudo for etiqueta, conteudo in secoes.items())
+    # O salvamento completo se identifica pelo próprio conteúdo; deltas antigos de outra base são ignorados
+    crc = zlib.crc32(corpo)
+    identificador = crc if tipo == COMPLETO else base
+    return CABECALHO.pack(MAGICO, VERSAO_FORMATO, tipo, identificador, crc) + corpo
+
+# Lê o cabeçalho e separa as seções de um buffer (sem copiar: cada seção é uma fatia do buffer)
+# Arquivos de outro formato, truncados ou corrompidos (CRC diferente) geram ValueError
+def ler_secoes(buffer):
+    dados = memoryview(buffer)
+    if len(dados) < CABECALHO.size:
+        raise ValueError("Salvamento truncado")
+    magico, versao, tipo, identificador, crc = CABECALHO.unpack_from(dados, 0)
+    if magico != MAGICO or versao != VERSAO_FORMATO:
+        raise ValueError("Formato de salvamento desconhecido")
+    if zlib.crc32(dados[CABECALHO.size:]) != crc:
+        raise ValueError("Salvamento corrompido")
+
+    secoes = {}
+    posicao = CABECALHO.size
+    while posicao < len(dados):
+        if posicao + SECAO.size > len(dados):
+            raise ValueError("Salvamento truncado")
+        etiqueta, tamanho = SECAO.unpack_from(dados, posicao)
+        posicao += SECAO.size
+        if posicao + tamanho > len(dados):
+            raise ValueError("Salvamento truncado")
+        secoes[etiqueta] = dados[posicao:posicao + tamanho]
+        posicao += tamanho
+    return tipo, identificador, secoes
+
+# Reconstrói a partida a partir das seções de um salvamento completo (já com as de um delta aplicadas)
+def restaurar(secoes):
+    semente, ticks, jogador_y, jogador_x, quantidade_npcs = PARTIDA.unpack(secoes[b"PART"])
+
+    dados_jogador = secoes[b"JOGA"]
+    vida, usa_arma_distancia, usa_escudo, tamanho_nome, tamanho_classe = JOGADOR.unpack_from(dados_jogador, 0)
+    inicio = JOGADOR.size
+    nome = bytes(dados_jogador[inicio:inicio + tamanho_nome]).decode("utf-8")
+    classe = CLASSES_JOGADOR[bytes(dados_jogador[inicio + tamanho_nome:inicio + tamanho_nome + tamanho_classe]).decode("ascii")]
+    jogador = Jogador.__new__(classe)
+    Jogador.__init__(jogador, nome, vida, usa_arma_distancia, usa_escudo)
+
+    dados_rng = secoes[b"RNG_"]
+    versao, tem_gauss, gauss = ESTADO_RNG.unpack_from(dados_rng, 0)
+    palavras, _ = array_de_buffer(dados_rng, ESTADO_RNG.size, "I", (len(dados_rng) - ESTADO_RNG.size) // 4)
+    estado_rng = (versao, tuple(palavras), gauss if tem_gauss else None)
+
+    npcs = []
+    for y, x, velocidade, raio_deteccao, contador, tipo in REGISTRO_NPC.iter_unpack(secoes[b"NPCS"]):
+        npc = TIPOS_NPC[tipo](y, x)
+        npc.velocidade = velocidade
+        npc.raio_deteccao = raio_deteccao
+        npc.contador_movimento = contador
+        npcs.append(npc)
+
+    nivel = mundo = chunk_central = None
+    if b"MUND" in secoes:
+        semente_mundo, densidade, largura_chunk, altura_chunk, max_chunks = MUNDO.unpack(secoes[b"MUND"])
+        cy, cx = CHUNK_CENTRAL.unpack(secoes[b"CHNK"])
+        mundo = MundoEmChunks(semente_mundo, densidade, largura_chunk, altura_chunk, max_chunks)
+        # Os chunks alterados que vieram num delta substituem os do salvamento completo
+        for etiqueta in (b"EXPL", b"EXPD"):
+            if etiqueta not in secoes:
+                continue
+            dados = secoes[etiqueta]
+            (total,) = struct.unpack_from("<I", dados, 0)
+            posicao = 4
+            for _ in range(total):
+                cy_parte, cx_parte, tamanho = CHUNK_EXPLORADO.unpack_from(dados, posicao)
+                posicao += CHUNK_EXPLORADO.size
+                mundo.explorados[(cy_parte, cx_parte)] = bytes(dados[posicao:posicao + tamanho])
+                posicao += tamanho
+        chunk_central = (cy, cx)
+        explorado = mundo.explorado_regiao(cy, cx)
+    else:
+        nivel = Nivel.de_buffer(secoes[b"NIVL"], indexar=False)
+        nivel.grade.indice_piso = IndicePiso.de_buffer(secoes[b"INDP"])
+        explorado = MapaExplorado.de_buffer(secoes[b"EXPL"])
+
+    return Simulacao.restaurar(jogador, None if semente < 0 else semente, estado_rng, ticks, (jogador_y, jogador_x),
+                               npcs, quantidade_npcs, explorado, nivel, mundo, chunk_central)
+
+# Reconstrói a partida de um buffer completo, aplicando um delta (bytes) se ele for da mesma base
+# Um delta ilegível é ignorado como um de outra base: a partida volta ao salvamento completo
+# Salvamentos ilegíveis ou incompletos geram ValueError
+def de_buffer(buffer, delta=None):
+    tipo, identificador, secoes = ler_secoes(buffer)
+    if tipo != COMPLETO:
+        raise ValueError("Um delta só pode ser carregado junto com o salvamento completo")
+    if delta is not None:
+        try:
+            tipo_delta, base, secoes_delta = ler_secoes(delta)
+        except ValueError:
+            tipo_delta = None
+        if tipo_delta == DELTA and base == identificador:
+            atualizadas = {etiqueta: secoes_delta[etiqueta] for etiqueta in SECOES_DINAMICAS if etiqueta in secoes_delta}
+            # No modo com chunks, a memória do delta só tem os chunks alterados e vai por cima da completa
+            if b"MUND" in secoes and b"EXPL" in atualizadas:
+                secoes[b"EXPD"] = atualizadas.pop(b"EXPL")
+            secoes.update(atualizadas)
+    try:
+        return restaurar(secoes)
+    except (KeyError, struct.error, zlib.error) as erro:
+        raise ValueError(f"Salvamento incompleto: {erro}") from None
+
+# Grava a partida completa e descarta o delta antigo; retorna o identificador do salvamento
+def salvar(simulacao, caminho=CAMINHO_PADRAO):
+    dados = para_bytes(simulacao)
+    gravar_atomicamente(caminho, dados)
+    try:
+        os.remove(caminho + EXTENSAO_DELTA)
+    except FileNotFoundError:
+        pass
+    return CABECALHO.unpack_from(dados, 0)[3]
+
+# Verifica se há uma partida salva no caminho
+def existe_salvamento(caminho=CAMINHO_PADRAO):
+    return os.path.exists(caminho)
+
+# Carrega a partida mapeando o arquivo completo em memória, com o delta mais recente aplicado por cima
+# Um arquivo vazio, truncado, corrompido ou de outra versão gera ValueError
+def carregar(caminho=CAMINHO_PADRAO):
+    try:
+        with open(caminho + EXTENSAO_DELTA, "rb") as arquivo:
+            delta = arquivo.read()
+    except FileNotFoundError:
+        delta = None
+
+    with open(caminho, "rb") as arquivo:
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            # O erro é trocado por outro sem traceback antes de sair do with: as fatias do mapa presas
+            # nele impediriam o mmap de fechar (ver CacheNiveis.carregar)
+            try:
+                return de_buffer(mapa, delta)
+            except ValueError as erro:
+                mensagem = str(erro)
+    raise ValueError(mensagem)
+
+# Salvamento automático a cada intervalo ticks: a primeira vez grava a partida completa
+# e depois só deltas, que não repetem o nível (a maior parte do arquivo)
+class Autosalvamento:
+    def __init__(self, caminho=CAMINHO_PADRAO, intervalo=INTERVALO_AUTOSALVAMENTO):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.base = None
+        # Alteração da memória dos chunks gravada no salvamento completo (ver MundoEmChunks.alteracoes)
+        self.alteracoes_base = 0
+        self.ultimo_tick = None
+
+    # Salva se já passaram intervalo ticks desde o último salvamento; retorna True se salvou
+    def verificar(self, simulacao):
+        if self.ultimo_tick is not None and simulacao.ticks - self.ultimo_tick < self.intervalo:
+            return False
+        self.salvar(simulacao)
+        return True
+
+    # Salva agora (ex.: ao sair do jogo)
+    def salvar(self, simulacao):
+        if self.base is None:
+            self.base = salvar(simulacao, self.caminho)
+            if simulacao.mundo is not None:
+                self.alteracoes_base = simulacao.mundo.alteracoes
+        else:
+            gravar_atomicamente(self.caminho + EXTENSAO_DELTA,
+                                para_bytes(simulacao, DELTA, self.base, self.alteracoes_base))
+        self.ultimo_tick = simulacao.ticks
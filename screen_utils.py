@@ -1,9 +1,118 @@
 import curses
 import textwrap
-import math
+from fov import CampoDeVisao, janela_visao
+from grade import CLASSE_TILE, TILE_NPC
+from mapa_explorado import MapaExplorado
+from perfil import PERFIL
+
+# Calcula as posições das divisões da tela (meio vertical e horizontal)
+def calcular_divisores(altura, largura):
+    return (largura // 2) + 25, (altura // 2) + 6
+
+# Classe que mantém o quadro anterior e envia ao terminal apenas as células que mudaram
+class Renderizador:
+    def __init__(self, tela):
+        self.tela = tela
+        self.tamanho = None
+        self.moldura_caracteres = []
+        self.moldura_atributos = []
+        self.anterior_caracteres = []
+        self.anterior_atributos = []
+        self.caracteres = []
+        self.atributos = []
+        # Células e trechos enviados ao terminal no último quadro
+        self.enviadas = 0
+        self.trechos = 0
+
+    # Começa um novo quadro a partir da moldura estática (refeita só quando o terminal muda de tamanho)
+    def iniciar_quadro(self):
+        tamanho = self.tela.getmaxyx()
+        if tamanho != self.tamanho:
+            self.redimensionar(tamanho)
+        self.caracteres = [linha[:] for linha in self.moldura_caracteres]
+        self.atributos = [linha[:] for linha in self.moldura_atributos]
+
+    # Refaz a moldura (divisões da tela) e limpa o terminal para um redesenho completo
+    def redimensionar(self, tamanho):
+        self.tamanho = tamanho
+        altura, largura = tamanho
+        self.moldura_caracteres = [[' '] * largura for _ in range(altura)]
+        self.moldura_atributos = [[0] * largura for _ in range(altura)]
+
+        divisor_vertical, divisor_horizontal = calcular_divisores(altura, largura)
+        if 0 <= divisor_vertical < largura:
+            for linha in self.moldura_caracteres:
+                linha[divisor_vertical] = '|'
+        if 0 <= divisor_horizontal < altura:
+            linha = self.moldura_caracteres[divisor_horizontal]
+            linha[:min(divisor_vertical, largura)] = '-' * min(divisor_vertical, largura)
+
+        # Depois de limpo, o terminal fica em branco: é contra isso que o primeiro quadro é comparado
+        self.tela.clear()
+        self.anterior_caracteres = [[' '] * largura for _ in range(altura)]
+        self.anterior_atributos = [[0] * largura for _ in range(altura)]
+
+    # Coloca um caractere no quadro em construção (fora da tela é ignorado)
+    def definir(self, y, x, caractere, atributo=0):
+        altura, largura = self.tamanho
+        if 0 <= y < altura and 0 <= x < largura:
+            self.caracteres[y][x] = caractere
+            self.atributos[y][x] = atributo
+
+    # Escreve um texto no quadro em construção, cortando o que passar da borda
+    def escrever(self, y, x, texto, atributo=0):
+        altura, largura = self.tamanho
+        if not (0 <= y < altura) or x >= largura:
+            return
+        texto = texto[:largura - x]
+        self.caracteres[y][x:x + len(texto)] = texto
+        self.atributos[y][x:x + len(texto)] = [atributo] * len(texto)
+
+    # Compara o quadro novo com o anterior e envia só os trechos alterados, agrupados por atributo
+    def apresentar(self):
+        enviadas = trechos = 0
+        for y, (linha, atributos) in enumerate(zip(self.caracteres, self.atributos)):
+            linha_anterior = self.anterior_caracteres[y]
+            atributos_anteriores = self.anterior_atributos[y]
+            if linha == linha_anterior and atributos == atributos_anteriores:
+                continue
+
+            x = 0
+            largura = len(linha)
+            while x < largura:
+                if linha[x] == linha_anterior[x] and atributos[x] == atributos_anteriores[x]:
+                    x += 1
+                    continue
+                inicio = x
+                atributo = atributos[x]
+                x += 1
+                while x < largura and atributos[x] == atributo and (
+                        linha[x] != linha_anterior[x] or atributos_anteriores[x] != atributo):
+                    x += 1
+                self._enviar(y, inicio, "".join(linha[inicio:x]), atributo)
+                enviadas += x - inicio
+                trechos += 1
+
+        self.enviadas = enviadas
+        self.trechos = trechos
+        self.anterior_caracteres = self.caracteres
+        self.anterior_atributos = self.atributos
+        self.tela.noutrefresh()
+        curses.doupdate()
+
+    # Envia um trecho ao terminal; escrever na última célula da tela gera erro no curses, mas o texto é exibido
+    def _enviar(self, y, x, texto, atributo):
+        try:
+            self.tela.addstr(y, x, texto, atributo)
+        except curses.error:
+            pass
 
 # Função principal responsável por desenhar toda a interface do jogo no terminal
-def desenhar_layout(tela, dungeon, pos_jogador, texto_secao2, texto_secao3, jogador):
+# quadro é o QuadroVisual da partida: o campo de visão usa o mapa base (sem NPCs/jogador) e só os trechos
+# da janela visível são lidos, então o custo de cada quadro depende do tamanho da tela, não do mapa
+# explorado é a memória do nível (MapaExplorado); sem ela, só o que está em vista aparece
+# texto_secao3 aparece no painel lateral abaixo das informações do jogador, uma linha por linha do texto
+def desenhar_layout(tela, quadro, pos_jogador, texto_secao2, texto_secao3, jogador, explorado=None):
     # Inicializa as cores apenas uma vez
     if not hasattr(desenhar_layout, 'cores_inicializadas'):
         curses.start_color()
@@ -13,114 +122,78 @@ def desenhar_layout(tela, dungeon, pos_jogador, texto_secao2, texto_secao3, joga
     # Monta informações do jogador para mostrar na lateral direita
     info_jogador = f"Nome: {jogador.nome}\nClasse: {jogador.__class__.__name__}\nVida: {jogador.vida}\n"
     info_jogador += "Arma: Arco" if jogador.usa_arma_distancia else "Arma: Espada & Escudo"
-    texto_secao3 = info_jogador
 
     jogador_y, jogador_x = pos_jogador
 
-    # Mapa de visibilidade e memória visual da dungeon
-    if not hasattr(desenhar_layout, 'mapa_visibilidade'):
-        desenhar_layout.mapa_visibilidade = [[False for _ in range(len(dungeon[0]))] for _ in range(len(dungeon))]
-    if not hasattr(desenhar_layout, 'mapa_ultima_visao'):
-        desenhar_layout.mapa_ultima_visao = [[None for _ in range(len(dungeon[0]))] for _ in range(len(dungeon))]
+    # Memória visual da dungeon (tiles já vistos e como estavam)
+    if explorado is None:
+        explorado = MapaExplorado(quadro.largura, quadro.altura)
 
-    tela.clear()
+    # Renderizador guardado entre chamadas para comparar cada quadro com o anterior
+    if getattr(desenhar_layout, 'renderizador', None) is None or desenhar_layout.renderizador.tela is not tela:
+        desenhar_layout.renderizador = Renderizador(tela)
+    renderizador = desenhar_layout.renderizador
+    renderizador.iniciar_quadro()
 
-    # Tamanho da janela visível da dungeon
-    largura_visao = 70
-    altura_visao = 16
-
-    # Calcula o canto superior esquerdo da visão do jogador
-    topo = max(0, min(jogador_y - altura_visao // 2, len(dungeon) - altura_visao))
-    esquerda = max(0, min(jogador_x - largura_visao // 2, len(dungeon[0]) - largura_visao))
+    # Janela visível da dungeon em volta do jogador
+    topo, esquerda, altura_janela, largura_janela = janela_visao(pos_jogador, quadro.largura, quadro.altura)
 
     # Define as divisões da tela (meio vertical e horizontal)
-    altura, largura = tela.getmaxyx()
-    divisor_vertical = (largura // 2) + 25
-    divisor_horizontal = (altura // 2) + 6
+    altura, largura = renderizador.tamanho
+    divisor_vertical, divisor_horizontal = calcular_divisores(altura, largura)
 
-    # Função auxiliar para exibir texto quebrado (formatado)
+    # Função auxiliar para exibir texto quebrado (formatado); retorna quantas linhas ocupou
     def exibir_texto_formatado(inicio_y, inicio_x, largura_max, altura_max, texto):
-        linhas_quebradas = textwrap.wrap(texto, largura_max)
-        for i, linha in enumerate(linhas_quebradas[:altura_max]):
-            tela.addstr(inicio_y + i, inicio_x, linha)
-
-    # Determina se uma posição é visível ao jogador (usando linha de visão)
-    def visivel(y, x):
-        distancia = math.sqrt((y - jogador_y) ** 2 + (x - jogador_x) ** 2)
-        if distancia > 12:
-            return False
-        linha = linha_bresenham(jogador_y, jogador_x, y, x)
-        for (ly, lx) in linha:
-            if dungeon[ly][lx] == '#':
-                return (ly == y and lx == x)
-        return True
-
-    # Algoritmo de Bresenham para traçar linhas entre dois pontos
-    def linha_bresenham(y0, x0, y1, x1):
-        linha = []
-        dx = abs(x1 - x0)
-        dy = -abs(y1 - y0)
-        sx = 1 if x0 < x1 else -1
-        sy = 1 if y0 < y1 else -1
-        erro = dx + dy
-        while True:
-            linha.append((y0, x0))
-            if x0 == x1 and y0 == y1:
-                break
-            e2 = 2 * erro
-            if e2 >= dy:
-                erro += dy
-                x0 += sx
-            if e2 <= dx:
-                erro += dx
-                y0 += sy
-        return linha
-
-    # Atualiza os mapas de visibilidade e visão anterior
-    for y in range(len(dungeon)):
-        for x in range(len(dungeon[0])):
-            if visivel(y, x):
-                desenhar_layout.mapa_visibilidade[y][x] = True
-                desenhar_layout.mapa_ultima_visao[y][x] = dungeon[y][x]
+        linhas_quebradas = textwrap.wrap(texto, largura_max)[:altura_max]
+        for i, linha in enumerate(linhas_quebradas):
+            renderizador.escrever(inicio_y + i, inicio_x, linha)
+        return len(linhas_quebradas)
+
+    # Campo de visão calculado uma única vez e recalculado só quando o jogador se move ou o mapa muda
+    if not hasattr(desenhar_layout, 'campo_visao'):
+        desenhar_layout.campo_visao = CampoDeVisao()
+    campo_visao = desenhar_layout.campo_visao
+    visiveis = campo_visao.visiveis
+
+    # Junta os tiles em vista à memória do nível (as bordas das paredes lembradas são atualizadas junto)
+    with PERFIL.trecho("fov"):
+        recalculado = campo_visao.atualizar(quadro.base, pos_jogador)
+        explorado.registrar(visiveis, quadro)
+    if PERFIL.ativo:
+        PERFIL.contar("tiles_visiveis", len(visiveis))
+        if recalculado:
+            PERFIL.contar("raios_fov", campo_visao.raios)
 
     # Desenha a visão da dungeon com base na posição do jogador
-    for y in range(altura_visao):
-        for x in range(largura_visao):
-            tile_y = topo + y
+    for y in range(altura_janela):
+        tile_y = topo + y
+        # Só o trecho da linha dentro da janela, já com os personagens; cada item é o código do tile
+        linha = quadro.trecho(tile_y, esquerda, esquerda + largura_janela)
+        # O que a memória do nível mostra fora de vista (0 onde não há nada a desenhar)
+        lembrada = explorado.linha_lembrada(tile_y, esquerda, largura_janela, visiveis)
+        for x in range(largura_janela):
             tile_x = esquerda + x
-            if 0 <= tile_y < len(dungeon) and 0 <= tile_x < len(dungeon[0]):
-                if desenhar_layout.mapa_visibilidade[tile_y][tile_x]:
-                    if visivel(tile_y, tile_x):
-                        tile = dungeon[tile_y][tile_x]
-                        if tile in ["N", "F", "S"]:
-                            tela.addch(y + 1, x + 1, tile)
-                        elif tile_y == jogador_y and tile_x == jogador_x:
-                            tela.addch(y + 1, x + 1, "@")
-                        else:
-                            tela.addch(y + 1, x + 1, tile)
-                    else:
-                        tile = desenhar_layout.mapa_ultima_visao[tile_y][tile_x]
-                        if tile == '#':
-                            for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                                ny, nx = tile_y + dy, tile_x + dx
-                                if 0 <= ny < len(dungeon) and 0 <= nx < len(dungeon[0]):
-                                    if dungeon[ny][nx] in ['.', '@', 'N', 'F', 'S'] and desenhar_layout.mapa_visibilidade[ny][nx]:
-                                        tela.addch(y + 1, x + 1, '#', curses.color_pair(1))
-                                        break
-                        else:
-                            tela.addch(y + 1, x + 1, tile, curses.color_pair(1))
+            if (tile_y, tile_x) in visiveis:
+                tile = linha[x]
+                if CLASSE_TILE[tile] & TILE_NPC:
+                    renderizador.definir(y + 1, x + 1, chr(tile))
+                elif tile_y == jogador_y and tile_x == jogador_x:
+                    renderizador.definir(y + 1, x + 1, "@")
                 else:
-                    tela.addch(y + 1, x + 1, ' ')
+                    renderizador.definir(y + 1, x + 1, chr(tile))
+            elif lembrada[x]:
+                renderizador.definir(y + 1, x + 1, chr(lembrada[x]), curses.color_pair(1))
 
     # Exibe os textos das seções laterais e de rodapé
     exibir_texto_formatado(divisor_horizontal + 1, 1, divisor_vertical - 2, altura - divisor_horizontal - 2, texto_secao2)
-    exibir_texto_formatado(1, divisor_vertical + 2, largura - divisor_vertical - 4, altura - 2, texto_secao3)
-
-    # Desenha as divisões visuais na interface
-    for y in range(altura):
-        tela.addch(y, divisor_vertical, '|')
-    for x in range(divisor_vertical):
-        tela.addch(divisor_horizontal, x, '-')
-
-    # Atualiza a tela com todas as alterações
-    tela.refresh()
+    largura_painel = largura - divisor_vertical - 4
+    usadas = exibir_texto_formatado(1, divisor_vertical + 2, largura_painel, altura - 2, info_jogador)
+    for i, linha in enumerate(texto_secao3.splitlines()[:max(0, altura - 3 - usadas)]):
+        renderizador.escrever(usadas + 2 + i, divisor_vertical + 2, linha[:largura_painel])
+
+    # Envia ao terminal apenas o que mudou desde o último quadro (as divisões fazem parte da moldura)
+    with PERFIL.trecho("terminal"):
+        renderizador.apresentar()
+    if PERFIL.ativo:
+        PERFIL.contar("celulas_enviadas", renderizador.enviadas)
+        PERFIL.contar("trechos_enviados", renderizador.trechos)
@@ -0,0 +1,283 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from agendador import AgendadorTicks
+from cache_niveis import DIRETORIO_PADRAO, nivel_de_buffer, obter_nivel_em_bytes
+from fov import CampoDeVisao, janela_visao, LARGURA_VISAO, ALTURA_VISAO
+from personagens import Cavaleiro, Patrulheiro
+from simulacao import (Simulacao, semente_do_nivel, LARGURA_DUNGEON, ALTURA_DUNGEON, DENSIDADE_SALAS,
+                       ACAO_NENHUMA, ACAO_CIMA, ACAO_BAIXO, ACAO_ESQUERDA, ACAO_DIREITA, ACAO_FUGIR)
+
+# Endereço e porta em que o servidor escuta (só a máquina local, por padrão)
+ENDERECO_PADRAO = os.environ.get("TEMPLO_ENDERECO", "127.0.0.1")
+PORTA_PADRAO = int(os.environ.get("TEMPLO_PORTA", "7777"))
+
+# Níveis mantidos em memória para novas sessões com a mesma semente (os em uso ficam com as sessões)
+MAX_NIVEIS = 32
+
+# Bytes pendentes de envio a partir dos quais uma sessão lenta deixa de receber os quadros dos ticks
+LIMITE_PENDENTE = 64 * 1024
+
+# Letras dos comandos de movimento; uma linha pode trazer várias (ex.: "ddds")
+LETRAS_ACOES = {
+    "w": ACAO_CIMA,
+    "s": ACAO_BAIXO,
+    "a": ACAO_ESQUERDA,
+    "d": ACAO_DIREITA,
+    "f": ACAO_FUGIR,
+}
+
+# Primeira linha dos quadros enviados pelos ticks, sem pedido do cliente; as respostas aos comandos não
+# a têm e saem na ordem dos comandos, então um cliente separa umas dos outros só por ela
+MARCA_TICK = "*tick"
+
+# Classes que o jogador pode escolher no comando "novo"
+CLASSES = {"cavaleiro": Cavaleiro, "patrulheiro": Patrulheiro}
+
+AJUDA = (
+    "Comandos (um por linha):",
+    "  novo <nome> [cavaleiro|patrulheiro] [semente]  - começa uma partida",
+    "  w a s d                                        - anda (várias letras seguidas valem)",
+    "  f                                              - foge do combate",
+    "  (linha vazia)                                  - mostra o quadro atual",
+    "  ajuda | sair",
+    f"Quadros enviados sozinhos, quando algo muda na tela, começam com a linha {MARCA_TICK}",
+)
+
+# Tiles sem nada a mostrar têm código 0 na linha lembrada e aparecem em branco
+SEM_VISAO = bytes.maketrans(b"\0", b" ")
+
+# Monta o quadro de texto de uma partida: a janela da dungeon em volta do jogador e a linha de estado
+# Usa as mesmas regras da tela do jogo (janela_visao, campo de visão e MapaExplorado.linha_lembrada)
+# Depois de registrar, a memória já tem o código atual de cada tile em vista, então cada linha da janela
+# sai inteira dela
+def compor_quadro(simulacao, campo_visao, largura_visao=LARGURA_VISAO, altura_visao=ALTURA_VISAO):
+    dungeon = simulacao.dungeon
+    explorado = simulacao.explorado
+    campo_visao.atualizar(dungeon, simulacao.pos_jogador)
+    visiveis = campo_visao.visiveis
+    explorado.registrar(visiveis, simulacao.quadro_visual())
+
+    topo, esquerda, altura, largura = janela_visao(simulacao.pos_jogador, dungeon.largura, dungeon.altura,
+                                                   largura_visao, altura_visao)
+    linhas = []
+    for tile_y in range(topo, topo + altura):
+        linha = explorado.linha_lembrada(tile_y, esquerda, largura, visiveis).translate(SEM_VISAO)
+        linhas.append(linha.decode("latin-1").rstrip())
+
+    jogador = simulacao.jogador
+    linhas.append(f"Tick {simulacao.ticks}  {jogador.nome} ({jogador.__class__.__name__})  Vida {jogador.vida}")
+    linhas.append(simulacao.texto_rodape())
+    return linhas
+
+# Codifica uma resposta do protocolo: linhas de texto terminadas por uma linha com só um ponto
+# Linhas que começam com ponto ganham outro ponto na frente (como no SMTP)
+def codificar(linhas):
+    return "".join("." + linha + "\r\n" if linha.startswith(".") else linha + "\r\n"
+                   for linha in linhas).encode("utf-8") + b".\r\n"
+
+# Níveis obtidos no pool de processos e compartilhados pelas sessões que usam a mesma semente
+# Pedidos simultâneos da mesma semente esperam a mesma geração; os menos usados saem da memória
+# Com diretorio_cache, os trabalhadores leem e guardam os níveis no CacheNiveis em disco, então um servidor
+# reiniciado não gera de novo as sementes já vistas (None deixa os níveis só em memória)
+class NiveisCompartilhados:
+    def __init__(self, pool, largura=LARGURA_DUNGEON, altura=ALTURA_DUNGEON, densidade=DENSIDADE_SALAS,
+                 max_niveis=MAX_NIVEIS, diretorio_cache=DIRETORIO_PADRAO):
+        self.pool = pool
+        self.largura = largura
+        self.altura = altura
+        self.densidade = densidade
+        self.max_niveis = max_niveis
+        self.diretorio_cache = diretorio_cache
+        self.niveis = OrderedDict()
+        self.gerados = 0
+
+    # Retorna o nível da semente dada, gerando-o no pool se ninguém o pediu ainda
+    async def obter(self, semente_nivel):
+        tarefa = self.niveis.get(semente_nivel)
+        if tarefa is None:
+            tarefa = self.niveis[semente_nivel] = asyncio.ensure_future(self._gerar(semente_nivel))
+            while len(self.niveis) > self.max_niveis:
+                self.niveis.popitem(last=False)
+        else:
+            self.niveis.move_to_end(semente_nivel)
+
+        try:
+            # shield: uma sessão que desiste no meio não cancela a geração para as outras
+            return await asyncio.shield(tarefa)
+        except Exception:
+            # Uma geração que falhou não fica no cache; o próximo pedido tenta de novo
+            if self.niveis.get(semente_nivel) is tarefa:
+                del self.niveis[semente_nivel]
+            raise
+
+    # O nível vem do processo trabalhador no formato do cache, bem menor que o objeto serializado e com
+    # o índice de piso pronto, para o laço de eventos não percorrer a grade a cada semente nova
+    async def _gerar(self, semente_nivel):
+        loop = asyncio.get_running_loop()
+        dados = await loop.run_in_executor(self.pool, obter_nivel_em_bytes, self.diretorio_cache, semente_nivel,
+                                           self.largura, self.altura, self.densidade)
+        self.gerados += 1
+        return nivel_de_buffer(dados)
+
+# Uma conexão: a partida do jogador (se já começou) e o campo de visão usado nos seus quadros
+class Sessao:
+    def __init__(self, escritor):
+        self.escritor = escritor
+        self.simulacao = None
+        self.campo_visao = CampoDeVisao()
+        self.alterada = False
+
+    # Envia linhas de texto sem esperar (o envio de verdade fica com o laço de eventos)
+    def enviar(self, linhas):
+        self.escritor.write(codificar(linhas))
+
+    # Com do_tick=True o quadro foi empurrado pelos ticks e leva MARCA_TICK na frente
+    def enviar_quadro(self, do_tick=False):
+        self.alterada = False
+        linhas = compor_quadro(self.simulacao, self.campo_visao)
+        self.enviar([MARCA_TICK] + linhas if do_tick else linhas)
+
+    # Sessões cujo cliente não está lendo param de receber os quadros dos ticks até o envio andar
+    def atrasada(self):
+        return self.escritor.transport.get_write_buffer_size() > LIMITE_PENDENTE
+
+# Servidor de várias partidas num único laço asyncio: cada linha recebida é um comando da sessão,
+# um único agendador avança os ticks de todas as partidas e manda o quadro novo de quem mudou
+# A geração de níveis vai para um pool de processos, para não travar o laço
+class Servidor:
+    def __init__(self, largura=LARGURA_DUNGEON, altura=ALTURA_DUNGEON, densidade=DENSIDADE_SALAS,
+                 trabalhadores=None, diretorio_cache=DIRETORIO_PADRAO):
+        # Processos criados por spawn: com fork, os trabalhadores herdariam os sockets abertos das sessões
+        # e as conexões não fechariam quando o servidor as encerra
+        self.pool = ProcessPoolExecutor(max_workers=trabalhadores, mp_context=multiprocessing.get_context("spawn"))
+        self.niveis = NiveisCompartilhados(self.pool, largura, altura, densidade, diretorio_cache=diretorio_cache)
+        self.largura = largura
+        self.altura = altura
+        self.densidade = densidade
+        self.sessoes = set()
+        self.servidor = None
+        self.tarefa_ticks = None
+
+    async def iniciar(self, endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO):
+        self.servidor = await asyncio.start_server(self.atender, endereco, porta)
+        self.tarefa_ticks = asyncio.ensure_future(self.avancar_ticks())
+        return self.servidor.sockets[0].getsockname()
+
+    async def encerrar(self):
+        if self.tarefa_ticks is not None:
+            self.tarefa_ticks.cancel()
+        if self.servidor is not None:
+            self.servidor.close()
+            await self.servidor.wait_closed()
+        for sessao in list(self.sessoes):
+            sessao.escritor.close()
+        self.pool.shutdown(cancel_futures=True)
+
+    # Avança os ticks de todas as partidas no ritmo do jogo
+    async def avancar_ticks(self):
+        agendador = AgendadorTicks()
+        while True:
+            await asyncio.sleep(agendador.espera_ms() / 1000)
+            vencidos = agendador.ticks_vencidos()
+            if vencidos:
+                self.avancar_sessoes(vencidos)
+
+    # Avança vencidos ticks de cada partida e envia o quadro só de quem viu algo mudar na tela
+    # (NPCs andando fora do alcance da visão não geram quadro, ver Simulacao.avancar_tick)
+    def avancar_sessoes(self, vencidos):
+        for sessao in list(self.sessoes):
+            if sessao.simulacao is None:
+                continue
+            for _ in range(vencidos):
+                if sessao.simulacao.avancar_tick():
+                    sessao.alterada = True
+            if sessao.alterada and not sessao.atrasada():
+                sessao.enviar_quadro(do_tick=True)
+
+    # Começa uma partida; a semente da partida fixa o nível, que é compartilhado com quem usar a mesma
+    async def nova_partida(self, sessao, argumentos):
+        if not argumentos:
+            return ["Uso: novo <nome> [cavaleiro|patrulheiro] [semente]"]
+        nome = argumentos[0]
+        classe = CLASSES.get(argumentos[1].lower() if len(argumentos) > 1 else "cavaleiro")
+        if classe is None:
+            return ["Classe desconhecida: use cavaleiro ou patrulheiro"]
+        try:
+            semente = int(argumentos[2]) if len(argumentos) > 2 else random.getrandbits(32)
+        except ValueError:
+            return ["Semente inválida: use um número inteiro"]
+
+        nivel = await self.niveis.obter(semente_do_nivel(semente))
+        sessao.simulacao = Simulacao(classe(nome), self.largura, self.altura, self.densidade, semente=semente,
+                                     nivel=nivel)
+        sessao.campo_visao = CampoDeVisao()
+        return None
+
+    # Executa um comando; retorna as linhas de resposta, None para responder com o quadro ou False para sair
+    async def executar(self, sessao, comando):
+        partes = comando.split()
+        nome = partes[0].lower() if partes else ""
+        if nome == "sair":
+            return False
+        if nome == "ajuda":
+            return list(AJUDA)
+        if nome == "novo":
+            return await self.nova_partida(sessao, partes[1:])
+        if sessao.simulacao is None:
+            return ["Nenhuma partida em andamento: use novo <nome>"]
+        if nome == "":
+            return None
+
+        acoes = [LETRAS_ACOES.get(letra, ACAO_NENHUMA) for letra in nome]
+        if ACAO_NENHUMA in acoes:
+            return [f"Comando desconhecido: {comando.strip()} (use ajuda)"]
+        for acao in acoes:
+            sessao.simulacao.aplicar_acao(acao)
+        return None
+
+    # Atende uma conexão até o cliente sair ou desconectar
+    async def atender(self, leitor, escritor):
+        sessao = Sessao(escritor)
+        self.sessoes.add(sessao)
+        try:
+            sessao.enviar(["Into The Temple Of The Python"] + list(AJUDA))
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                resposta = await self.executar(sessao, linha.decode("utf-8", "replace"))
+                if resposta is False:
+                    break
+                if resposta is None:
+                    sessao.enviar_quadro()
+                else:
+                    sessao.enviar(resposta)
+                await escritor.drain()
+        except (ConnectionError, ValueError):
+            # ValueError: linha maior que o limite do leitor
+            pass
+        finally:
+            self.sessoes.discard(sessao)
+            escritor.close()
+
+# Sobe o servidor e atende até ser interrompido
+async def servir(endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO):
+    servidor = Servidor()
+    endereco, porta = (await servidor.iniciar(endereco, porta))[:2]
+    print(f"Servidor escutando em {endereco}:{porta}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.encerrar()
+
+# python servidor.py [porta]; para jogar: nc 127.0.0.1 7777 (ou telnet)
+if __name__ == "__main__":
+    try:
+        asyncio.run(servir(porta=int(sys.argv[1]) if len(sys.argv) > 1 else PORTA_PADRAO))
+    except KeyboardInterrupt:
+        pass
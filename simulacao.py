@@ -0,0 +1,254 @@
+import random
+from bsp import gerar_nivel
+from grade import QuadroVisual, VAZIO
+from registro_entidades import RegistroEntidades
+from lote_npcs import LoteNPCs
+from campo_fluxo import CampoDeFluxo
+from fov import RAIO_VISAO
+from mapa_explorado import MapaExplorado
+from personagens import TIPOS_NPC, posicao_vazia_aleatoria, posicao_inimigo_livre
+
+# Define as dimensões da dungeon e densidade de salas
+LARGURA_DUNGEON = 280
+ALTURA_DUNGEON = 64
+DENSIDADE_SALAS = 0.75
+
+# Quantidade de NPCs criados em cada nível
+QUANTIDADE_NPCS = 12
+
+# Ações que o jogador pode tomar em um passo da simulação
+ACAO_NENHUMA = 0
+ACAO_CIMA = 1
+ACAO_BAIXO = 2
+ACAO_ESQUERDA = 3
+ACAO_DIREITA = 4
+ACAO_FUGIR = 5
+
+# Deslocamento (dy, dx) de cada ação de movimento
+MOVIMENTOS = {
+    ACAO_CIMA: (-1, 0),
+    ACAO_BAIXO: (1, 0),
+    ACAO_ESQUERDA: (0, -1),
+    ACAO_DIREITA: (0, 1),
+}
+
+# Semente do nível de uma partida com a semente dada (é o primeiro sorteio da partida)
+# Permite gerar o nível à parte (em outro processo ou compartilhado) e passá-lo pronto em nivel
+def semente_do_nivel(semente):
+    return random.Random(semente).getrandbits(32)
+
+# Estado completo de uma partida (dungeon, jogador, NPCs e combate), sem nenhuma dependência de tela
+# Pode ser conduzida pelo curses, por um bot ou por testes de balanceamento em lote
+# semente fixa o nível e todos os sorteios da partida; nivel permite reaproveitar um nível já gerado
+# (o de semente_do_nivel(semente) dá uma partida igual à que geraria o próprio nível)
+# Com um mundo (MundoEmChunks), a dungeon é só a região de chunks em volta do jogador, refeita quando
+# ele passa para outro chunk; as posições continuam relativas à região e origem dá o seu canto no mundo
+class Simulacao:
+    def __init__(self, jogador, largura=LARGURA_DUNGEON, altura=ALTURA_DUNGEON, densidade=DENSIDADE_SALAS,
+                 semente=None, quantidade_npcs=QUANTIDADE_NPCS, nivel=None, mundo=None):
+        if semente is None:
+            semente = random.getrandbits(32)
+        self.semente = semente
+        self.rng = random.Random(semente)
+        self.jogador = jogador
+        self.quantidade_npcs = quantidade_npcs
+        self.mundo = mundo
+        self.origem = (0, 0)
+
+        if mundo is not None:
+            self.chunk_central = (0, 0)
+            self.dungeon, self.origem = mundo.regiao(*self.chunk_central)
+            self.explorado = mundo.explorado_regiao(*self.chunk_central)
+        else:
+            # O sorteio da semente do nível acontece mesmo com o nível pronto, para o resto da partida não mudar
+            semente_nivel = self.rng.getrandbits(32)
+            if nivel is None:
+                nivel = gerar_nivel(largura, altura, densidade, semente_nivel)
+            self.dungeon = nivel.grade
+            # Memória do que o jogador já viu neste nível
+            self.explorado = MapaExplorado(self.dungeon.largura, self.dungeon.altura)
+        self.nivel = nivel
+        self.jogador_y, self.jogador_x = posicao_vazia_aleatoria(self.dungeon, self.rng)
+        self.montar_npcs([])
+
+        self.ticks = 0
+        # NPCs que andaram no último tick
+        self.npcs_movidos = 0
+        self.inimigo_combate = None
+        if mundo is not None:
+            self.acompanhar_jogador()
+
+    # Recria uma partida salva (ver salvamento.py) sem gerar nem sortear nada: todo o estado vem pronto
+    # No modo com chunks, a região é montada de novo a partir do mundo e de chunk_central
+    @staticmethod
+    def restaurar(jogador, semente, estado_rng, ticks, pos_jogador, npcs, quantidade_npcs, explorado,
+                  nivel=None, mundo=None, chunk_central=None):
+        simulacao = Simulacao.__new__(Simulacao)
+        simulacao.semente = semente
+        simulacao.rng = random.Random()
+        simulacao.rng.setstate(estado_rng)
+        simulacao.jogador = jogador
+        simulacao.quantidade_npcs = quantidade_npcs
+        simulacao.mundo = mundo
+        simulacao.nivel = nivel
+        simulacao.origem = (0, 0)
+        if mundo is not None:
+            simulacao.chunk_central = chunk_central
+            simulacao.dungeon, simulacao.origem = mundo.regiao(*chunk_central)
+        else:
+            simulacao.dungeon = nivel.grade
+        simulacao.explorado = explorado
+        simulacao.jogador_y, simulacao.jogador_x = pos_jogador
+        simulacao.montar_npcs(npcs)
+        simulacao.ticks = ticks
+        simulacao.npcs_movidos = 0
+        simulacao.verificar_combate()
+        return simulacao
+
+    @property
+    def pos_jogador(self):
+        return (self.jogador_y, self.jogador_x)
+
+    # Posição do jogador em coordenadas de mundo (igual a pos_jogador fora do modo com chunks)
+    @property
+    def pos_mundo(self):
+        return (self.origem[0] + self.jogador_y, self.origem[1] + self.jogador_x)
+
+    # Registra os NPCs dados (já na dungeon atual) e sorteia novos até completar quantidade_npcs
+    def montar_npcs(self, npcs):
+        # NPCs registrados pelo tile que ocupam; o estado usado a cada tick fica no lote, em arrays
+        self.registro = RegistroEntidades()
+        self.lote = LoteNPCs(self.dungeon)
+        for npc in npcs:
+            self.registro.adicionar(npc, npc.y, npc.x)
+            self.lote.adicionar(npc)
+        # Sem tiles livres, a dungeon fica com menos NPCs que o pedido
+        for _ in range(self.quantidade_npcs - len(npcs)):
+            posicao = posicao_inimigo_livre(self.dungeon, self.registro, self.pos_jogador, self.rng)
+            if posicao is None:
+                break
+            npc = self.rng.choice(TIPOS_NPC)(*posicao)
+            self.registro.adicionar(npc, npc.y, npc.x)
+            self.lote.adicionar(npc)
+
+        # Distâncias até o jogador compartilhadas pelos NPCs que o perseguem, refeitas só quando ele se move
+        self.campo = CampoDeFluxo(self.dungeon, 2 * max(self.lote.raio_deteccao, default=0), self.lote.mascara)
+
+    # No modo com chunks, recentraliza a região quando o jogador entra em outro chunk
+    # NPCs que ficaram fora da nova região são descartados e substituídos por novos sorteados nela
+    # Retorna True se a região mudou
+    def acompanhar_jogador(self):
+        chunk = self.mundo.chunk_de(*self.pos_mundo)
+        if chunk == self.chunk_central:
+            return False
+
+        dungeon, origem = self.mundo.regiao(*chunk)
+        dy = self.origem[0] - origem[0]
+        dx = self.origem[1] - origem[1]
+
+        npcs = []
+        for i, npc in enumerate(self.lote.npcs):
+            npc.contador_movimento = self.lote.contador_movimento[i]
+            if dungeon.dentro(npc.y + dy, npc.x + dx):
+                npc.y += dy
+                npc.x += dx
+                npcs.append(npc)
+
+        # A memória da região antiga volta para os chunks e a da nova é montada a partir deles
+        self.mundo.guardar_explorado(self.explorado, *self.chunk_central)
+        self.explorado = self.mundo.explorado_regiao(*chunk)
+
+        self.dungeon = dungeon
+        self.origem = origem
+        self.chunk_central = chunk
+        self.jogador_y += dy
+        self.jogador_x += dx
+        self.montar_npcs(npcs)
+        self.verificar_combate()
+        return True
+
+    @property
+    def em_combate(self):
+        return self.inimigo_combate is not None
+
+    # O combate começa quando o jogador e um NPC ocupam o mesmo tile
+    def verificar_combate(self):
+        self.inimigo_combate = self.registro.em(self.jogador_y, self.jogador_x)
+
+    # Aplica uma ação do jogador; retorna True se algo mudou
+    # Em combate só é possível fugir (o inimigo é mandado para longe); fora dele, só andar
+    def aplicar_acao(self, acao):
+        if self.em_combate:
+            if acao != ACAO_FUGIR:
+                return False
+            # Com todo o chão ocupado não há para onde mandar o inimigo, e a fuga falha
+            posicao = posicao_inimigo_livre(self.dungeon, self.registro, self.pos_jogador, self.rng)
+            if posicao is None:
+                return False
+            novo_y, novo_x = posicao
+            self.registro.mover(self.inimigo_combate, novo_y, novo_x)
+            self.lote.reposicionar(self.inimigo_combate, novo_y, novo_x)
+        else:
+            movimento = MOVIMENTOS.get(acao)
+            if movimento is None:
+                return False
+            novo_y = self.jogador_y + movimento[0]
+            novo_x = self.jogador_x + movimento[1]
+            if not self.dungeon.caminhavel(novo_y, novo_x):
+                return False
+            self.jogador_y, self.jogador_x = novo_y, novo_x
+            if self.mundo is not None:
+                self.acompanhar_jogador()
+
+        self.verificar_combate()
+        return True
+
+    # Avança um tick: os NPCs andam no seu ritmo (e ficam parados durante o combate)
+    # Retorna True se o quadro mudou: algum NPC andou dentro do alcance da visão (o único trecho em que
+    # quadro_visual os desenha) ou o combate começou; NPCs andando longe não pedem um quadro novo
+    def avancar_tick(self):
+        self.ticks += 1
+        self.npcs_movidos = 0
+        if self.em_combate:
+            return False
+        self.campo.atualizar(self.pos_jogador)
+        alcance = (self.jogador_y - RAIO_VISAO, self.jogador_x - RAIO_VISAO,
+                   self.jogador_y + RAIO_VISAO, self.jogador_x + RAIO_VISAO)
+        self.npcs_movidos = self.lote.atualizar(self.pos_jogador, self.registro, self.rng, self.campo, alcance)
+        if not self.npcs_movidos:
+            return False
+        self.verificar_combate()
+        return self.lote.movidos_na_regiao > 0 or self.em_combate
+
+    # Um passo completo da simulação: a ação do jogador seguida de um tick
+    def passo(self, acao=ACAO_NENHUMA):
+        alterado = self.aplicar_acao(acao)
+        return self.avancar_tick() or alterado
+
+    # Executa uma sequência de ações o mais rápido possível, sem desenhar nada; retorna o número de ticks
+    def executar(self, acoes):
+        aplicar_acao = self.aplicar_acao
+        avancar_tick = self.avancar_tick
+        for acao in acoes:
+            aplicar_acao(acao)
+            avancar_tick()
+        return self.ticks
+
+    # Quadro mostrado na tela: em combate só o inimigo sobre um fundo vazio; fora dele, o mapa com
+    # o jogador e os NPCs ao alcance da visão por cima (sem copiar o mapa, ver QuadroVisual)
+    def quadro_visual(self):
+        if self.em_combate:
+            visual = QuadroVisual(self.dungeon, VAZIO)
+            visual.definir(self.jogador_y, self.jogador_x, ord(self.inimigo_combate.simbolo))
+            return visual
+
+        visual = QuadroVisual(self.dungeon)
+        lado = 2 * RAIO_VISAO + 1
+        for npc in self.registro.na_regiao(self.jogador_y - RAIO_VISAO, self.jogador_x - RAIO_VISAO, lado, lado):
+            visual.definir(npc.y, npc.x, ord(npc.simbolo))
+        visual.definir(self.jogador_y, self.jogador_x, ord("@"))
+        return visual
+
+    # Texto do rodapé conforme o estado da partida
+    def texto_rodape(self):
+        return "Pressione F para fugir" if self.em_combate else "Texto de rodapé teste"
@@ -0,0 +1,39 @@
+import hashlib
+import random
+from bsp import gerar_nivel
+
+# Resumo (SHA-256 truncado) de 10 sementes por tamanho e densidade, tirado do gerador anterior às listas
+# de trabalho por passada e às salas guardadas por subárvore: grade, salas (na ordem), corredores,
+# árvore achatada e o estado final do gerador de números aleatórios
+REFERENCIA = {
+    (40, 13, 0.3): "da53006df9a4512e977841617063ca3f",
+    (40, 13, 0.75): "ca558a31613c6e614522365e0d0c9ff7",
+    (40, 13, 1.0): "f49ab62b90876e1238032a5e231a41bd",
+    (80, 24, 0.3): "4cd2cc8828afadea8acc338781cb0658",
+    (80, 24, 0.75): "3ebebee940ba6bbe36a8ee07b187a654",
+    (80, 24, 1.0): "68e0cb1848206e93caafee24f3fb1067",
+    (280, 64, 0.3): "3e3d3b27fca917bbd1e841bf45bd8b22",
+    (280, 64, 0.75): "4c28352f801f4c84852a27f127fb13a8",
+    (280, 64, 1.0): "cba52165d8f168dbfbf943af593f48d4",
+    (560, 128, 0.3): "29e6d84cee3cf98618538ad41e352306",
+    (560, 128, 0.75): "b26ecb159c960baa879ab87b26d5ec3b",
+    (560, 128, 1.0): "8414708693696e4e72501403506cb591",
+}
+
+# Resume os níveis das sementes 0 a 9 e o estado do gerador depois de cada um
+def resumir(largura, altura, densidade):
+    resumo = hashlib.sha256()
+    for semente in range(10):
+        rng = random.Random(semente)
+        nivel = gerar_nivel(largura, altura, densidade, rng)
+        resumo.update(nivel.grade.celulas)
+        resumo.update(repr([(sala.x, sala.y, sala.largura, sala.altura) for sala in nivel.salas]).encode())
+        resumo.update(repr([tuple(corredor) for corredor in nivel.corredores]).encode())
+        resumo.update(repr([tuple(no) for no in nivel.arvore]).encode())
+        resumo.update(repr(rng.getstate()).encode())
+    return resumo.hexdigest()[:32]
+
+# A mesma semente continua gerando exatamente o mesmo nível e consumindo os mesmos sorteios
+def test_bsp_igual_ao_gerador_de_referencia():
+    diferentes = [parametros for parametros, esperado in REFERENCIA.items() if resumir(*parametros) != esperado]
+    assert not diferentes
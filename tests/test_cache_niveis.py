@@ -0,0 +1,37 @@
+from bsp import gerar_nivel
+from cache_niveis import CacheNiveis
+from indice_piso import IndicePiso
+
+PARAMETROS = (11, 120, 40, 0.75)
+
+# O índice de piso sai pronto do arquivo, igual ao montado percorrendo a grade
+def test_acerto_do_cache_traz_o_indice_pronto(tmp_path):
+    cache = CacheNiveis(str(tmp_path))
+    gerado = cache.obter(*PARAMETROS)
+    carregado = cache.carregar(*PARAMETROS)
+
+    assert carregado.grade.celulas == gerado.grade.celulas == gerar_nivel(120, 40, 0.75, 11).grade.celulas
+    assert carregado.para_bytes() == gerado.para_bytes()
+    montado = IndicePiso(carregado.grade, carregado.salas)
+    indice = carregado.grade.indice_piso
+    assert indice.celulas == montado.celulas
+    assert indice.baldes == montado.baldes
+    assert indice.por_sala == montado.por_sala
+
+# Arquivos vazios, truncados ou com bytes trocados contam como ausentes e o nível é gerado de novo
+def test_arquivo_corrompido_e_gerado_de_novo(tmp_path):
+    cache = CacheNiveis(str(tmp_path))
+    original = cache.obter(*PARAMETROS).para_bytes()
+    caminho = cache.caminho(cache.chave(*PARAMETROS))
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+
+    corrompido = bytearray(conteudo)
+    corrompido[len(conteudo) // 2] ^= 0xFF
+    for estrago in (b"", conteudo[:10], conteudo[:len(conteudo) // 2], conteudo[:-4], bytes(corrompido)):
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(estrago)
+        assert cache.carregar(*PARAMETROS) is None
+        assert cache.obter(*PARAMETROS).para_bytes() == original
+        with open(caminho, "rb") as arquivo:
+            assert arquivo.read() == conteudo
@@ -0,0 +1,39 @@
+from fov import CampoDeVisao, RAIO_VISAO
+from grade import CHAO, PAREDE, GradeDungeon
+
+# Sala aberta 61x61 com uma parede vertical logo à direita do jogador, no centro
+def montar_sala():
+    grade = GradeDungeon(61, 61, preenchimento=CHAO)
+    for y in range(25, 36):
+        grade.definir(y, 31, PAREDE)
+    return grade, (30, 30)
+
+def test_campo_de_visao_em_sala_montada_a_mao():
+    grade, jogador = montar_sala()
+    campo = CampoDeVisao()
+    assert campo.atualizar(grade, jogador)
+    visiveis = campo.visiveis
+
+    # O tile do jogador e a parede encostada nele aparecem
+    assert jogador in visiveis
+    assert {(y, 31) for y in range(29, 32)} <= visiveis
+
+    # Atrás da parede não se vê nada
+    assert not {(y, x) for y in range(28, 33) for x in range(32, 43)} & visiveis
+
+    # Do outro lado, o chão aparece até RAIO_VISAO e nada além dele
+    assert (30, 30 - RAIO_VISAO) in visiveis
+    assert (30, 30 - RAIO_VISAO - 1) not in visiveis
+    assert all((y - 30) ** 2 + (x - 30) ** 2 <= RAIO_VISAO ** 2 for y, x in visiveis)
+
+def test_atualizar_so_recalcula_quando_algo_muda():
+    grade, jogador = montar_sala()
+    campo = CampoDeVisao()
+    assert campo.atualizar(grade, jogador)
+    antes = set(campo.visiveis)
+    assert not campo.atualizar(grade, jogador)
+    assert campo.visiveis == antes
+
+    # Outra posição ou outro mapa recalculam
+    assert campo.atualizar(grade, (30, 29))
+    assert campo.atualizar(montar_sala()[0], (30, 29))
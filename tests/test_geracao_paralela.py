@@ -0,0 +1,11 @@
+from geracao_paralela import gerar_varios
+
+# None é uma semente como as outras (o nível recebe uma sorteada) e não encerra a geração
+def test_semente_none_nao_interrompe_a_geracao():
+    resultados = list(gerar_varios([1, None, 3], 40, 13, 0.3, trabalhadores=2))
+
+    assert len(resultados) == 3
+    assert sorted(semente for semente, _ in resultados if semente is not None) == [1, 3]
+    for semente, nivel in resultados:
+        if semente is not None:
+            assert nivel.semente == semente
@@ -0,0 +1,48 @@
+import random
+from bsp import gerar_nivel
+from campo_fluxo import CampoDeFluxo
+from indice_piso import obter_indice_piso
+from lote_npcs import LoteNPCs
+from personagens import TIPOS_NPC
+from registro_entidades import RegistroEntidades
+
+# Mesmos NPCs, registro e campo de fluxo para os dois caminhos de atualização
+def montar(dungeon, posicoes, tipos):
+    npcs = [tipo(y, x) for tipo, (y, x) in zip(tipos, posicoes)]
+    registro = RegistroEntidades()
+    lote = LoteNPCs(dungeon)
+    for npc in npcs:
+        registro.adicionar(npc, npc.y, npc.x)
+        lote.adicionar(npc)
+    campo = CampoDeFluxo(dungeon, 2 * max(lote.raio_deteccao), lote.mascara)
+    return npcs, registro, lote, campo
+
+# Com o mesmo estado do gerador, o lote faz exatamente os movimentos de NPC.mover, um NPC por vez
+def test_lote_igual_a_mover_por_objeto():
+    dungeon = gerar_nivel(280, 64, 0.75, 5).grade
+    indice = obter_indice_piso(dungeon)
+    sorteio = random.Random(5)
+    posicoes = [indice.posicao(celula) for celula in sorteio.sample(list(indice.celulas), 300)]
+    tipos = [sorteio.choice(TIPOS_NPC) for _ in posicoes]
+    npcs, registro, _, campo = montar(dungeon, posicoes, tipos)
+    npcs_lote, registro_lote, lote, campo_lote = montar(dungeon, posicoes, tipos)
+
+    pos_jogador = indice.aleatoria(sorteio)
+    estado = random.getstate()
+    try:
+        for tick in range(200):
+            # O jogador troca de lugar de tempos em tempos, para haver perseguições e passeios
+            if tick % 25 == 0:
+                pos_jogador = indice.aleatoria(sorteio)
+            random.seed(tick)
+            campo.atualizar(pos_jogador)
+            movidos = sum(npc.mover(dungeon, pos_jogador, registro, campo) for npc in npcs)
+            random.seed(tick)
+            campo_lote.atualizar(pos_jogador)
+            assert lote.atualizar(pos_jogador, registro_lote, random, campo_lote) == movidos
+
+            assert [(npc.y, npc.x) for npc in npcs_lote] == [(npc.y, npc.x) for npc in npcs]
+            assert list(zip(lote.y, lote.x)) == [(npc.y, npc.x) for npc in npcs]
+            assert list(lote.contador_movimento) == [npc.contador_movimento for npc in npcs]
+    finally:
+        random.setstate(estado)
@@ -0,0 +1,66 @@
+import random
+from collections import deque
+from grade import CHAO
+from mundo import MundoEmChunks
+
+# Todo o chão da região (3x3 chunks) forma um único trecho ligado, atravessando as bordas pelas portas
+def test_regiao_tem_todo_o_chao_ligado():
+    for semente in range(4):
+        for densidade in (0.3, 0.75, 1.0):
+            mundo = MundoEmChunks(semente=semente, densidade=densidade)
+            grade, _ = mundo.regiao(semente - 2, 1 - semente)
+            chao = {divmod(indice, grade.largura) for indice, codigo in enumerate(grade.celulas) if codigo == CHAO}
+
+            inicio = next(iter(chao))
+            alcancados = {inicio}
+            fila = deque([inicio])
+            while fila:
+                y, x = fila.popleft()
+                for vizinho in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                    if vizinho in chao and vizinho not in alcancados:
+                        alcancados.add(vizinho)
+                        fila.append(vizinho)
+            assert alcancados == chao, (semente, densidade)
+
+# Um chunk descartado do cache volta igual quando é gerado de novo
+def test_chunk_descartado_volta_igual():
+    mundo = MundoEmChunks(semente=9, max_chunks=2)
+    nivel = mundo.chunk(0, 0)
+    celulas = bytes(nivel.grade.celulas)
+    indice = nivel.grade.indice_piso.para_bytes()
+    corredores = list(nivel.corredores)
+
+    mundo.chunk(0, 1)
+    mundo.chunk(1, 0)
+    assert (0, 0) not in mundo.chunks
+    de_novo = mundo.chunk(0, 0)
+    assert de_novo is not nivel
+    assert mundo.gerados == 4
+    assert bytes(de_novo.grade.celulas) == celulas
+    assert de_novo.grade.indice_piso.para_bytes() == indice
+    assert de_novo.corredores == corredores
+
+# A memória de uma região guardada chunk a chunk é montada de volta igual, inclusive em outra região
+# que a cobre em parte
+def test_memoria_da_regiao_ida_e_volta():
+    mundo = MundoEmChunks(semente=4)
+    rng = random.Random(4)
+    explorado = mundo.explorado_regiao(3, -2)
+    for dados in (explorado.bits, explorado.bordas, explorado.ultima_visao):
+        dados[:] = bytes(rng.getrandbits(8) for _ in range(len(dados)))
+
+    mundo.guardar_explorado(explorado, 3, -2)
+    assert len(mundo.explorados) == 9
+    volta = mundo.explorado_regiao(3, -2)
+    assert volta.bits == explorado.bits
+    assert volta.bordas == explorado.bordas
+    assert volta.ultima_visao == explorado.ultima_visao
+
+    # A região vizinha, um chunk à direita, tem dois terços da memória guardada
+    vizinha = mundo.explorado_regiao(3, -1)
+    largura = mundo.largura_chunk
+    for y in range(explorado.altura):
+        linha = explorado.ultima_visao[y * explorado.largura:(y + 1) * explorado.largura]
+        linha_vizinha = vizinha.ultima_visao[y * vizinha.largura:(y + 1) * vizinha.largura]
+        assert linha_vizinha[:2 * largura] == linha[largura:]
+        assert not any(linha_vizinha[2 * largura:])
@@ -0,0 +1,38 @@
+import random
+from indice_piso import obter_indice_piso
+from personagens import Cavaleiro, posicao_inimigo_livre
+from registro_entidades import RegistroEntidades
+from simulacao import Simulacao, ACAO_FUGIR
+
+# Pedir mais NPCs que tiles de chão enche a dungeon e para, em vez de sortear para sempre
+def test_npcs_demais_ocupam_o_chao_e_param():
+    simulacao = Simulacao(Cavaleiro("x"), 40, 13, 0.3, semente=1, quantidade_npcs=5000)
+    indice = obter_indice_piso(simulacao.dungeon)
+    ocupados = {(npc.y, npc.x) for npc in simulacao.lote.npcs}
+
+    assert len(ocupados) == len(simulacao.lote)
+    assert ocupados | {simulacao.pos_jogador} == set(map(indice.posicao, indice.celulas))
+
+    # Com o chão todo ocupado, a fuga não tem para onde mandar o inimigo
+    simulacao.verificar_combate()
+    assert simulacao.em_combate
+    assert not simulacao.aplicar_acao(ACAO_FUGIR)
+    assert simulacao.em_combate
+
+# Quando quase tudo está ocupado, os tiles livres que restam ainda são encontrados
+def test_posicao_inimigo_livre_acha_os_ultimos_tiles():
+    simulacao = Simulacao(Cavaleiro("x"), 40, 13, 0.3, semente=1, quantidade_npcs=0)
+    indice = obter_indice_piso(simulacao.dungeon)
+    posicoes = [indice.posicao(celula) for celula in indice.celulas if indice.posicao(celula) != simulacao.pos_jogador]
+    livres = set(posicoes[:3])
+    registro = RegistroEntidades()
+    for posicao in posicoes[3:]:
+        registro.adicionar(object(), *posicao)
+
+    rng = random.Random(7)
+    for _ in range(3):
+        posicao = posicao_inimigo_livre(simulacao.dungeon, registro, simulacao.pos_jogador, rng)
+        assert posicao in livres
+        livres.discard(posicao)
+        registro.adicionar(object(), *posicao)
+    assert posicao_inimigo_livre(simulacao.dungeon, registro, simulacao.pos_jogador, rng) is None
@@ -0,0 +1,171 @@
+import struct
+from collections import deque
+import pytest
+import benchmark
+import main
+import salvamento
+from fov import CampoDeVisao
+from mapa_explorado import MapaExplorado
+from mundo import MundoEmChunks
+from personagens import Cavaleiro
+from simulacao import Simulacao, MOVIMENTOS, ACAO_NENHUMA, ACAO_FUGIR
+
+# Ação que leva de um tile ao vizinho, pelo deslocamento (dy, dx)
+ACOES_POR_MOVIMENTO = {movimento: acao for acao, movimento in MOVIMENTOS.items()}
+
+# Caminho (lista de ações) da posição do jogador até o tile de chão mais próximo fora do chunk central,
+# sem pisar em NPCs; a busca é feita em coordenadas da região atual
+def caminho_ate_outro_chunk(simulacao):
+    dungeon = simulacao.dungeon
+    inicio = simulacao.pos_jogador
+    anterior = {inicio: None}
+    fila = deque([inicio])
+    while fila:
+        y, x = fila.popleft()
+        mundo_y, mundo_x = simulacao.origem[0] + y, simulacao.origem[1] + x
+        if simulacao.mundo.chunk_de(mundo_y, mundo_x) != simulacao.chunk_central:
+            acoes = []
+            while anterior[(y, x)] is not None:
+                py, px = anterior[(y, x)]
+                acoes.append(ACOES_POR_MOVIMENTO[(y - py, x - px)])
+                y, x = py, px
+            return acoes[::-1]
+        for dy, dx in MOVIMENTOS.values():
+            vizinho = (y + dy, x + dx)
+            if (vizinho not in anterior and dungeon.caminhavel(*vizinho)
+                    and simulacao.registro.em(*vizinho) is None):
+                anterior[vizinho] = (y, x)
+                fila.append(vizinho)
+    raise AssertionError("nenhum caminho até outro chunk")
+
+def assert_mesma_partida(a, b):
+    assert a.pos_mundo == b.pos_mundo
+    assert a.pos_jogador == b.pos_jogador
+    assert a.origem == b.origem
+    assert a.ticks == b.ticks
+    assert a.rng.getstate() == b.rng.getstate()
+    assert [(npc.y, npc.x) for npc in a.lote.npcs] == [(npc.y, npc.x) for npc in b.lote.npcs]
+    assert a.explorado.bits == b.explorado.bits
+
+def test_delta_no_mundo_em_chunks_guarda_o_chunk_central(tmp_path):
+    caminho = str(tmp_path / "partida.sav")
+    simulacao = Simulacao(Cavaleiro("Teste"), semente=7, mundo=MundoEmChunks(semente=7))
+    autosalvamento = salvamento.Autosalvamento(caminho)
+    autosalvamento.salvar(simulacao)
+    chunk_inicial = simulacao.chunk_central
+
+    for acao in caminho_ate_outro_chunk(simulacao):
+        assert simulacao.aplicar_acao(acao)
+    simulacao.executar([ACAO_NENHUMA] * 5)
+    assert simulacao.chunk_central != chunk_inicial
+
+    # O salvamento completo ainda é o do chunk inicial: o delta tem que trazer a região nova
+    autosalvamento.salvar(simulacao)
+    carregada = salvamento.carregar(caminho)
+    assert carregada.chunk_central == simulacao.chunk_central
+    assert carregada.dungeon.caminhavel(*carregada.pos_jogador)
+    assert_mesma_partida(carregada, simulacao)
+
+    # As duas continuam iguais depois de carregar
+    acoes = [ACAO_FUGIR, ACAO_NENHUMA] * 20
+    simulacao.executar(acoes)
+    carregada.executar(acoes)
+    assert_mesma_partida(carregada, simulacao)
+
+def test_delta_em_nivel_fixo(tmp_path):
+    caminho = str(tmp_path / "partida.sav")
+    simulacao = Simulacao(Cavaleiro("Teste"), semente=3)
+    autosalvamento = salvamento.Autosalvamento(caminho)
+    autosalvamento.salvar(simulacao)
+    simulacao.executar([1, 4, 2, 3, 0] * 20)
+    autosalvamento.salvar(simulacao)
+
+    carregada = salvamento.carregar(caminho)
+    assert_mesma_partida(carregada, simulacao)
+    assert carregada.nivel.grade.celulas == simulacao.nivel.grade.celulas
+
+# Grava uma partida salva com um delta e devolve o caminho e o conteúdo dos dois arquivos
+def gravar_partida(tmp_path):
+    caminho = str(tmp_path / "partida.sav")
+    simulacao = Simulacao(Cavaleiro("Teste"), semente=3)
+    autosalvamento = salvamento.Autosalvamento(caminho)
+    autosalvamento.salvar(simulacao)
+    simulacao.executar([1, 4, 2, 3, 0] * 10)
+    autosalvamento.salvar(simulacao)
+    with open(caminho, "rb") as arquivo:
+        completo = arquivo.read()
+    with open(caminho + salvamento.EXTENSAO_DELTA, "rb") as arquivo:
+        delta = arquivo.read()
+    return caminho, simulacao, completo, delta
+
+def trocar_byte(dados, posicao):
+    dados = bytearray(dados)
+    dados[posicao] ^= 0x40
+    return bytes(dados)
+
+# Arquivos vazios, truncados, com um byte trocado ou de outra versão geram ValueError, nunca outro erro
+def test_salvamento_ilegivel_gera_value_error(tmp_path):
+    caminho, _, completo, _ = gravar_partida(tmp_path)
+    outra_versao = completo[:4] + struct.pack("<H", salvamento.VERSAO_FORMATO - 1) + completo[6:]
+    estragos = [b"", completo[:5], completo[:salvamento.CABECALHO.size + 3], completo[:len(completo) // 2],
+                completo[:-1], trocar_byte(completo, len(completo) // 2), trocar_byte(completo, len(completo) - 1),
+                outra_versao]
+    for estrago in estragos:
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(estrago)
+        with pytest.raises(ValueError):
+            salvamento.carregar(caminho)
+
+# Um delta corrompido é ignorado como um de outra base: a partida volta ao salvamento completo
+def test_delta_corrompido_volta_ao_salvamento_completo(tmp_path):
+    caminho, simulacao, completo, delta = gravar_partida(tmp_path)
+    with open(caminho + salvamento.EXTENSAO_DELTA, "wb") as arquivo:
+        arquivo.write(trocar_byte(delta, len(delta) - 1))
+
+    carregada = salvamento.carregar(caminho)
+    assert carregada.ticks == 0 < simulacao.ticks
+
+# Continuar uma partida ilegível avisa e começa uma nova, que sobrescreve o arquivo ao sair
+def test_loop_jogo_com_salvamento_ilegivel_comeca_partida_nova(tmp_path):
+    caminho, _, completo, _ = gravar_partida(tmp_path)
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(completo[:4] + struct.pack("<H", 1) + completo[6:])
+
+    tela = benchmark.TelaFalsa(teclas=[ord("c"), ord("x"), ord("1")])
+    benchmark.reiniciar_desenho()
+    with benchmark.curses_sem_terminal():
+        main.loop_jogo(tela, caminho_salvamento=caminho)
+    benchmark.reiniciar_desenho()
+
+    assert salvamento.carregar(caminho).jogador.nome == "Bench"
+
+# Os deltas do modo com chunks levam só a memória dos chunks alterados depois do salvamento completo,
+# e o que não foi no delta continua vindo do completo
+def test_delta_no_mundo_leva_so_chunks_alterados(tmp_path):
+    caminho = str(tmp_path / "partida.sav")
+    simulacao = Simulacao(Cavaleiro("Teste"), semente=7, mundo=MundoEmChunks(semente=7))
+    mundo = simulacao.mundo
+    # Memória de chunks distantes, visitados antes
+    for i in range(200):
+        parte = MapaExplorado(mundo.largura_chunk, mundo.altura_chunk)
+        parte.bits[i % len(parte.bits)] = 1
+        mundo.explorados[(50, i)] = parte.para_bytes()
+    autosalvamento = salvamento.Autosalvamento(caminho)
+    autosalvamento.salvar(simulacao)
+
+    for acao in caminho_ate_outro_chunk(simulacao):
+        assert simulacao.aplicar_acao(acao)
+    # O que o jogador vê (registrado pela tela no jogo de verdade) altera a memória dos chunks em volta
+    campo_visao = CampoDeVisao()
+    campo_visao.atualizar(simulacao.dungeon, simulacao.pos_jogador)
+    simulacao.explorado.registrar(campo_visao.visiveis, simulacao.quadro_visual())
+    autosalvamento.salvar(simulacao)
+
+    with open(caminho + salvamento.EXTENSAO_DELTA, "rb") as arquivo:
+        _, _, secoes = salvamento.ler_secoes(arquivo.read())
+    (total,) = struct.unpack_from("<I", secoes[b"EXPL"], 0)
+    assert 0 < total <= 9
+
+    carregada = salvamento.carregar(caminho)
+    assert_mesma_partida(carregada, simulacao)
+    assert carregada.mundo.explorados == mundo.explorados
@@ -0,0 +1,56 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cache_niveis
+from personagens import Cavaleiro
+from servidor import NiveisCompartilhados, Servidor, Sessao, MARCA_TICK
+from simulacao import Simulacao
+
+# Guarda o que a sessão envia, sem socket
+class EscritorFalso:
+    def __init__(self):
+        self.envios = []
+        self.transport = self
+
+    def write(self, dados):
+        self.envios.append(dados)
+
+    def get_write_buffer_size(self):
+        return 0
+
+# Os ticks só empurram um quadro para a sessão quando algo muda na tela dela
+def test_ticks_enviam_quadro_so_com_mudanca_visivel():
+    servidor = Servidor(trabalhadores=1)
+    try:
+        sessao = Sessao(EscritorFalso())
+        sessao.simulacao = Simulacao(Cavaleiro("x"), semente=7, quantidade_npcs=400)
+        servidor.sessoes.add(sessao)
+        gemea = Simulacao(Cavaleiro("x"), semente=7, quantidade_npcs=400)
+
+        esperados = 0
+        for _ in range(300):
+            servidor.avancar_sessoes(1)
+            esperados += gemea.avancar_tick()
+        assert 0 < len(sessao.escritor.envios) == esperados < 300
+        # Os quadros dos ticks vêm marcados; o pedido pelo cliente, não
+        assert all(envio.startswith(MARCA_TICK.encode() + b"\r\n") for envio in sessao.escritor.envios)
+        sessao.enviar_quadro()
+        assert not sessao.escritor.envios[-1].startswith(MARCA_TICK.encode())
+    finally:
+        servidor.pool.shutdown()
+
+# Um servidor reiniciado lê do cache em disco os níveis que já gerou, com o índice de piso pronto
+def test_niveis_do_servidor_vem_do_cache_em_disco(tmp_path, monkeypatch):
+    with ThreadPoolExecutor(1) as pool:
+        gerado = asyncio.run(NiveisCompartilhados(pool, 120, 40, 0.75, diretorio_cache=str(tmp_path)).obter(11))
+        assert len(os.listdir(tmp_path)) == 1
+
+        def sem_geracao(*argumentos):
+            raise AssertionError("o nível devia vir do cache")
+        monkeypatch.setattr(cache_niveis, "gerar_nivel", sem_geracao)
+        carregado = asyncio.run(NiveisCompartilhados(pool, 120, 40, 0.75, diretorio_cache=str(tmp_path)).obter(11))
+
+    assert carregado.para_bytes() == gerado.para_bytes()
+    assert carregado.grade.indice_piso is not None
+    assert carregado.grade.indice_piso.celulas == gerado.grade.indice_piso.celulas
@@ -0,0 +1,18 @@
+from personagens import Cavaleiro
+from simulacao import Simulacao
+
+# avancar_tick só avisa quando o quadro mostrado muda: NPCs andando longe do jogador não contam
+def test_avancar_tick_avisa_so_mudancas_visiveis():
+    simulacao = Simulacao(Cavaleiro("x"), semente=7, quantidade_npcs=400)
+    anterior = simulacao.quadro_visual()
+    visiveis = invisiveis = 0
+    for _ in range(300):
+        alterado = simulacao.avancar_tick()
+        atual = simulacao.quadro_visual()
+        assert alterado == (atual.sobreposicao != anterior.sobreposicao or atual.fundo != anterior.fundo)
+        visiveis += alterado
+        invisiveis += bool(simulacao.npcs_movidos) and not alterado
+        anterior = atual
+    # A partida passa pelos dois casos e termina em combate (que também conta como mudança)
+    assert visiveis and invisiveis
+    assert simulacao.em_combate